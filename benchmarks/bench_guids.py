@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Benchmark of GUIDReplacer against previous
+    regexp callback chain of make.replace_all_guids
+
+    python benchmarks/bench_guids.py
+"""
+
+import io
+import os
+import random
+import re
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guid_replacer import GUIDReplacer
+
+
+RE_OBJ_UUID = re.compile("[0-F]{8}[-_][0-F]{4}[-_][0-F]{4}[-_][0-F]{4}[-_][0-F]{12}", re.I)
+
+
+def legacy_re_res_sub(resources):
+
+    def func(match, *args, **kwargs):
+        data = match.group(0)
+        return (resources[data], True) if data in resources else (data, False)
+
+    return func
+
+
+def legacy_sub_chain_func(chain):
+
+    def func(match, *args, **kwargs):
+        for sub_func in chain:
+            result = sub_func(match, *args, **kwargs)
+            if result[1]:
+                return result[0]
+
+        return match.group(0)
+
+    return func
+
+
+def legacy_replace(mapping, data):
+    return RE_OBJ_UUID.sub(legacy_sub_chain_func([legacy_re_res_sub(mapping)]), data)
+
+
+def make_mapping(size):
+    mapping = {}
+    for _ in xrange(size):
+        old, new = str(uuid.uuid4()), str(uuid.uuid4())
+        mapping[old] = new
+        mapping[old.replace("-", "_")] = new.replace("-", "_")
+
+    return mapping
+
+
+def make_data(mapping, guids, other_guids, filler):
+    """Text of @guids GUIDs from @mapping and
+        @other_guids unknown GUIDs separated by @filler
+    """
+    rnd = random.Random(0)
+    keys = sorted(mapping)
+    parts = [rnd.choice(keys) for _ in xrange(guids)]
+    parts.extend(str(uuid.UUID(int=rnd.getrandbits(128))) for _ in xrange(other_guids))
+    rnd.shuffle(parts)
+    return filler.join(parts)
+
+
+MAPPINGS = {
+    "10": make_mapping(10),
+    "1000": make_mapping(1000),
+}
+
+
+def inputs(mapping):
+    return {
+        "page_json": make_data(mapping, 2000, 2000, '", "ID": "'),
+        "unknown": make_data(mapping, 0, 20000, '", "ID": "'),
+        "binary": os.urandom(4000000),
+    }
+
+
+def bench(func, data):
+    return min(timeit.repeat(lambda: func(data), number=3, repeat=3)) / 3
+
+
+def main():
+    print "{:<8} {:<12} {:>14} {:>14} {:>14} {:>8}".format(
+        "guids", "input", "legacy, ms", "replace, ms", "stream, ms", "speedup")
+
+    for mapping_name in sorted(MAPPINGS, key=int):
+        mapping = MAPPINGS[mapping_name]
+        replacer = GUIDReplacer(mapping, block_size=1 << 16)
+
+        def stream(data):
+            dst = io.BytesIO()
+            replacer.replace_stream(io.BytesIO(data), dst)
+            return dst.getvalue()
+
+        replace = replacer.replace
+
+        for input_name, data in sorted(inputs(mapping).iteritems()):
+            expected = legacy_replace(mapping, data)
+            assert replace(data) == expected, (mapping_name, input_name)
+            assert stream(data) == expected, (mapping_name, input_name)
+
+            old_time = bench(lambda data: legacy_replace(mapping, data), data) * 1e3
+            new_time = bench(replace, data) * 1e3
+            stream_time = bench(stream, data) * 1e3
+
+            print "{:<8} {:<12} {:>14.3f} {:>14.3f} {:>14.3f} {:>7.1f}x".format(
+                mapping_name, input_name, old_time, new_time, stream_time,
+                old_time / new_time)
+
+
+if __name__ == "__main__":
+    main()
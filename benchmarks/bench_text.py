@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Microbenchmarks of text normalization helpers
+    against their previous implementations
+
+    python benchmarks/bench_text.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import clean_data, normalize_text, cdata
+
+
+def legacy_clean_data(data, strip=True):
+    if len(set(data) - set(["\n", "\t"])) > 0:
+        return data.strip("\n\t\r") if strip else data
+
+    else:
+        return ""
+
+
+def legacy_encode(data, encoding="utf-8"):
+    return data.encode(encoding)
+
+
+def legacy_check_data(data):
+    return '"' in data or \
+           "'" in data or \
+           "<" in data or \
+           ">" in data or \
+           "\n" in data or \
+           "&" in data
+
+
+def legacy_cdata(data, force=False):
+    if not data.strip() and not force:
+        return data
+
+    if force or legacy_check_data(data):
+        if isinstance(data, str):
+            data = data.decode('utf8')
+
+        res = u"<![CDATA[{}]]>".format(data.replace("]]>", "]]]]><![CDATA[>"))
+        return res.encode('utf8')
+
+    return data
+
+
+INPUTS = {
+    "small": u"Button1",
+    "small_html": u"<b>Click</b>",
+    "blank": u"\n\t\n",
+    "large_html": (u"<div class=\"row\">текст &amp; "
+                   u"text</div>\n") * 100000,
+    "large_plain": u"x" * 4000000,
+}
+
+
+CASES = (
+    ("clean+encode",
+     lambda data: legacy_encode(legacy_clean_data(data)),
+     lambda data: normalize_text(data)),
+    ("clean",
+     legacy_clean_data,
+     clean_data),
+    ("cdata",
+     lambda data: legacy_cdata(data.encode("utf8")),
+     lambda data: cdata(data.encode("utf8"))),
+)
+
+
+def bench(func, data):
+    number = 100000 if len(data) < 1000 else 5
+    return min(timeit.repeat(lambda: func(data), number=number, repeat=3)) / number
+
+
+def main():
+    print "{:<14} {:<12} {:>14} {:>14} {:>8}".format(
+        "case", "input", "legacy, us", "new, us", "speedup")
+
+    for name, legacy, new in CASES:
+        for input_name in sorted(INPUTS):
+            data = INPUTS[input_name]
+            assert legacy(data) == new(data), (name, input_name)
+
+            old_time = bench(legacy, data) * 1e6
+            new_time = bench(new, data) * 1e6
+
+            print "{:<14} {:<12} {:>14.3f} {:>14.3f} {:>7.1f}x".format(
+                name, input_name, old_time, new_time, old_time / new_time)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,59 +4,482 @@
 
 import argparse
 import base64
+import collections
+import cStringIO
+import hashlib
 import logging
+import multiprocessing
 import os
-from uuid import UUID
+import Queue
+import re
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from itertools import imap, izip
+from multiprocessing.pool import ThreadPool
+from uuid import UUID, uuid5
 
 import constants
-from helpers import setup_logging, DEBUG, INFO, ERROR, CRITICAL, \
+from helpers import setup_logging, DEBUG, INFO, WARNING, ERROR, CRITICAL, \
     check_python_version, script_exit, uuid as gen_guid, \
-    json_load, open_file, clean_data, encode, emergency_exit, \
-    BLOCK_END, print_block_end
+    json_load, open_file, clean_data, normalize_text, encode, emergency_exit, \
+    scan_folder, BLOCK_END, print_block_end
+from git_helpers import GitTree
+from overlay import load_overlay
+from build_cache import FileCache, make_key
+from compressed_io import open_output
+from xml_emitter import XMLEmitter, open_tag, close_tag
+from validate import validate
+from watcher import create_watcher, wait_changes
 
 # Global variable for output
 OUTPUT_IO = None
+# Global XML emitter writing to OUTPUT_IO
+OUTPUT = None
+# Global variable for source tree
+SOURCE = None
 # Global dict of objects by their GUIDs
 OBJS = {}
+# Per-thread objects dict used by page workers
+LOCAL = threading.local()
+# Cache of rendered pages and encoded resources
+CACHE = None
+# (signature, SHA1 digest) of files by their paths
+DIGESTS = {}
+# Keep rendered pages in RENDERED between builds (watch mode)
+KEEP_RENDERED = False
+# Rendered pages by cache keys: (page state, data, objs)
+RENDERED = {}
+# GUIDs of collapsed duplicate resources mapped to GUID of kept copy
+RESOURCE_MAP = {}
+# Source root in reproducible mode, None otherwise
+REPRODUCIBLE = None
+# Namespace of GUIDs derived from file paths in reproducible mode
+GUID_NAMESPACE = UUID("5d1f8c5e-3a3b-4c1e-9a8e-2b7c0f6d4e91")
+# Read files by blocks of this size while encoding, multiple of 3
+ENCODE_BLOCK = 3 << 18
+# Kinds of walk stack entries
+FOLDER, FILE, TAIL = range(3)
+# Encoded blocks read ahead per thread of encoding pipeline
+PIPELINE_DEPTH = 4
+# Put to reader queue when file is read or reading failed
+BLOCKS_END = None
+READ_FAILED = object()
+
+# GUID in any case
+RE_GUID = re.compile(
+    "[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.I)
+
+
+class FileSystemSource(object):
+    """Application source tree on local file system
+    """
+
+    exists = staticmethod(os.path.exists)
+    isdir = staticmethod(os.path.isdir)
+    isfile = staticmethod(os.path.isfile)
+    listdir = staticmethod(os.listdir)
+    open = staticmethod(open_file)
+    scan = staticmethod(scan_folder)
+
+    @staticmethod
+    def location(path):
+        return os.path.abspath(path)
+
+    @staticmethod
+    def signature(path):
+        """Cheap file version check: size and mtime
+        """
+        stat = os.stat(path)
+        return "{}:{!r}".format(stat.st_size, stat.st_mtime)
+
+    @staticmethod
+    def digest(path):
+        """SHA1 of file content
+        """
+        sha = hashlib.sha1()
+        with open_file(path) as hdlr:
+            for block in iter(lambda: hdlr.read(1 << 20), ""):
+                sha.update(block)
+
+        return sha.hexdigest()
+
+    def reopen(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class DigestStream(object):
+    """Output stream wrapper calculating SHA256 of written data
+    """
 
+    def __init__(self, stream):
+        self.stream = stream
+        self.sha = hashlib.sha256()
 
-def check_data(data):
-    return '"' in data or \
-           "'" in data or \
-           "<" in data or \
-           ">" in data or \
-           "\n" in data or \
-           "&" in data
+    def write(self, data):
+        self.sha.update(data)
+        self.stream.write(data)
 
+    def writelines(self, lines):
+        for line in lines:
+            self.sha.update(line)
 
-def cdata(data, force=False):
-    if not data.strip() and not force:
-        return data
+        self.stream.writelines(lines)
 
-    if force or check_data(data):
-        if isinstance(data, str):
-            data = data.decode('utf8')
+    def flush(self):
+        self.stream.flush()
 
-        res = u"<![CDATA[{}]]>".format(data.replace("]]>", "]]]]><![CDATA[>"))
-        return res.encode('utf8')
-        
-    return data
+    def close(self):
+        self.stream.close()
 
+    def hexdigest(self):
+        return self.sha.hexdigest()
 
-def write_xml(tagname, attrs=None, data=None, close=False, indent=0, force_cdata=False, closing=False):
-    if isinstance(data, unicode):
-        data = data.encode('utf8')
 
-    OUTPUT_IO.write("{indent}<{closing}{tagname}{attrs}{close}>{data}{closetag}{newline}".format(
-        indent=" "*indent,
-        tagname=tagname,
-        attrs="" if not attrs else (" "+" ".join(['{}="{}"'.format(k, v) for k, v in attrs.items()])),
-        close="/" if close and data is None else "",
-        closetag="</{}>".format(tagname) if close and data is not None else "",
-        data=cdata(data, force_cdata) if data is not None else "",
-        newline="\n" if close or data is None else "",
-        closing="/" if closing else ""
-    ))
+def fallback_guid(path):
+    """Return GUID for file @path which has no GUID:
+        random one or derived from path in reproducible mode
+    """
+    if REPRODUCIBLE is None:
+        return gen_guid()
+
+    rel_path = os.path.relpath(path, REPRODUCIBLE or os.curdir)
+    return str(uuid5(GUID_NAMESPACE, rel_path.replace(os.sep, "/")))
+
+
+def ordered_items(mapping):
+    """Return items of @mapping, sorted in reproducible mode
+    """
+    if REPRODUCIBLE is None:
+        return mapping.items()
+
+    return sorted(mapping.items())
+
+
+def scan(path):
+    """Return {name: entry} for folder @path
+        or None if there is no such folder
+    """
+    try:
+        return SOURCE.scan(path)
+
+    except OSError:
+        return None
+
+
+def list_files(entries):
+    """Return sorted names of files from scan() result
+        except reserved ones
+    """
+    return sorted(
+        name for name, entry in entries.iteritems()
+        if name not in constants.RESERVED_NAMES and not entry.is_dir()
+    )
+
+
+def iter_base64(path):
+    """Encode file @path to base64 by blocks
+    """
+    with SOURCE.open(path) as src:
+        for block in iter(lambda: src.read(ENCODE_BLOCK), ""):
+            yield base64.b64encode(block)
+
+
+def cached_base64(path):
+    """Return path of cached base64 encoded content of file @path.
+        Entries are content-addressed, small reference entry maps
+        file location and signature to content digest
+    """
+    ref_key = make_key("ref", SOURCE.location(path))
+    signature = SOURCE.signature(path)
+
+    ref = CACHE.read_json(ref_key)
+    if ref and ref["signature"] == signature:
+        blob = CACHE.get(make_key("b64", ref["digest"]), ".b64")
+        if blob:
+            DEBUG("Encoded data taken from cache: %s", path)
+            return blob
+
+    digest = file_digest(path)
+    blob_key = make_key("b64", digest)
+
+    blob = CACHE.get(blob_key, ".b64")
+    if not blob:
+        DEBUG("Encoding and caching: %s", path)
+        blob = CACHE.write(blob_key, ".b64", iter_base64(path))
+
+    CACHE.write_json(ref_key, {"signature": signature, "digest": digest})
+    return blob
+
+
+def write_encoded(tagname, attrs, indent, path):
+    """Write element with base64 encoded content of file @path
+    """
+    DEBUG("Open file: %s", path)
+
+    if CACHE:
+        with open_file(cached_base64(path)) as src:
+            OUTPUT.splice(tagname, attrs, indent, src)
+        return
+
+    with SOURCE.open(path) as src:
+        OUTPUT.element(tagname, attrs, base64.b64encode(src.read()), indent)
+
+
+def encoded_data(path):
+    """Return base64 encoded content of file @path
+    """
+    if CACHE:
+        with open_file(cached_base64(path)) as src:
+            return src.read()
+
+    with SOURCE.open(path) as src:
+        return base64.b64encode(src.read())
+
+
+def encode_blocks(paths, queue):
+    """Thread of encoding pipeline: put base64 encoded blocks
+        of files @paths to @queue, BLOCKS_END after every file.
+        None paths are skipped
+    """
+    try:
+        for path in paths:
+            if path is None:
+                continue
+
+            with SOURCE.open(path) as src:
+                for block in iter(lambda: src.read(ENCODE_BLOCK), ""):
+                    queue.put(base64.b64encode(block))
+
+            queue.put(BLOCKS_END)
+
+    except BaseException:
+        queue.put(READ_FAILED)
+
+
+def write_encoded_parallel(elements, jobs, digests):
+    """Write elements with base64 encoded files: threads
+        read and encode files ahead, results are written
+        in order of @elements. Only first copy of identical
+        files is read and encoded
+    """
+    seen = set()
+    copies = []
+    for digest in digests:
+        copies.append(digest is not None and digest in seen)
+        seen.add(digest)
+
+    paths = [
+        None if copy else element[3]
+        for element, copy in izip(elements, copies)
+    ]
+
+    threads = min(jobs, len(elements))
+    queues = [Queue.Queue(PIPELINE_DEPTH) for _ in xrange(threads)]
+
+    for index, queue in enumerate(queues):
+        thread = threading.Thread(
+            target=encode_blocks,
+            args=(paths[index::threads], queue)
+        )
+        thread.daemon = True
+        thread.start()
+
+    # encoded parts of files which have copies left to write
+    shared = {}
+    left = collections.Counter(digests)
+
+    for index, element in enumerate(elements):
+        tagname, attrs, indent, path = element
+        digest = digests[index]
+        left[digest] -= 1
+
+        DEBUG("Open file: %s", path)
+        OUTPUT.write(open_tag(tagname, attrs, indent, OUTPUT.sort_attrs))
+
+        if copies[index]:
+            for part in shared[digest]:
+                OUTPUT.write(part)
+
+            if not left[digest]:
+                del shared[digest]
+
+        else:
+            parts = []
+            for part in iter(queues[index % threads].get, BLOCKS_END):
+                if part is READ_FAILED:
+                    emergency_exit()
+
+                OUTPUT.write(part)
+                parts.append(part)
+
+            if digest is not None and left[digest]:
+                shared[digest] = parts
+
+        OUTPUT.write(close_tag(tagname))
+
+
+def write_encoded_all(elements, jobs, digests=None):
+    """Write elements (tagname, attrs, indent, path)
+        with base64 encoded files. If @digests of files
+        are known, identical files are encoded once
+    """
+    if not elements:
+        return
+
+    digests = digests or [None] * len(elements)
+
+    if jobs > 1 and not CACHE:
+        write_encoded_parallel(elements, jobs, digests)
+        return
+
+    shared = {}
+    left = collections.Counter(digests)
+
+    for (tagname, attrs, indent, path), digest in izip(elements, digests):
+        left[digest] -= 1
+
+        if digest in shared:
+            DEBUG("Copy of encoded data: %s", path)
+            OUTPUT.element(tagname, attrs, shared[digest], indent)
+            if not left[digest]:
+                del shared[digest]
+
+        elif digest is not None and left[digest]:
+            DEBUG("Open file: %s", path)
+            shared[digest] = encoded_data(path)
+            OUTPUT.element(tagname, attrs, shared[digest], indent)
+
+        else:
+            write_encoded(tagname, attrs, indent, path)
+
+
+def file_digest(path):
+    """Return SHA1 digest of file @path,
+        it's remembered until file is changed
+    """
+    signature = SOURCE.signature(path)
+
+    known = DIGESTS.get(path)
+    if known and known[0] == signature:
+        return known[1]
+
+    digest = SOURCE.digest(path)
+    DIGESTS[path] = (signature, digest)
+    return digest
+
+
+def file_digests(paths, jobs):
+    """Return SHA1 digests of files @paths
+        calculated in @jobs threads
+    """
+    pool = ThreadPool(jobs) if jobs > 1 and paths else None
+    try:
+        return (pool.map if pool else map)(file_digest, paths)
+
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+
+def report_duplicates(paths, digests):
+    """Log groups of identical files
+    """
+    groups = {}
+    for path, digest in izip(paths, digests):
+        groups.setdefault(digest, []).append(os.path.basename(path))
+
+    copies = 0
+    for digest in sorted(groups):
+        names = groups[digest]
+        if len(names) > 1:
+            INFO("Identical resources: %s", ", ".join(names))
+            copies += len(names) - 1
+
+    if copies:
+        INFO("Resources Data: %s copies of identical files", copies)
+
+
+def resource_guid(name):
+    """Return GUID of resource file @name or None
+    """
+    try:
+        return str(UUID(name.split("_", 1)[0]))
+
+    except ValueError:
+        return None
+
+
+def resource_files(config):
+    """Return sorted names of resource files to write
+        or None if there is no Resources folder
+    """
+    resources_path = os.path.join(config["source"], constants.RESOURCES_FOLDER)
+    entries = scan(resources_path)
+    if entries is None:
+        return None
+
+    used = used_resources(config)
+
+    return [
+        name for name in list_files(entries)
+        if used is None or name in used
+    ]
+
+
+def collapse_duplicates(config):
+    """Map GUIDs of resources identical to previous ones
+        to GUIDs of these resources, copies are not written
+        and references to them are rewritten
+    """
+    resources_path = os.path.join(config["source"], constants.RESOURCES_FOLDER)
+
+    names = [
+        name for name in resource_files(config) or []
+        if resource_guid(name)
+    ]
+    digests = file_digests(
+        [os.path.join(resources_path, name) for name in names],
+        config.get("jobs", 1)
+    )
+
+    kept = {}
+    for name, digest in izip(names, digests):
+        guid = resource_guid(name)
+
+        if digest in kept:
+            DEBUG("Resource %s collapsed to %s", guid, kept[digest])
+            RESOURCE_MAP[guid] = kept[digest]
+
+        else:
+            kept[digest] = guid
+
+    INFO("Resources: %s duplicates collapsed", len(RESOURCE_MAP))
+
+
+def rewrite_guids(data):
+    """Replace GUIDs of collapsed resources in @data
+    """
+    return RE_GUID.sub(
+        lambda match: RESOURCE_MAP.get(match.group(0).lower(), match.group(0)),
+        data
+    )
+
+
+def new_emitter(stream):
+    """Return emitter for output @stream
+    """
+    return XMLEmitter(
+        stream,
+        rewrite=rewrite_guids if RESOURCE_MAP else None,
+        sort_attrs=REPRODUCIBLE is not None
+    )
 
 
 @print_block_end
@@ -66,89 +489,125 @@ def write_app_info(config):
 
     info_path = os.path.join(config["source"], constants.INFO_FILE)
 
-    with open_file(info_path) as info_file:
+    with SOURCE.open(info_path) as info_file:
         info_json = json_load(info_file, critical=True)
 
-    write_xml("Information", indent=2)
+    OUTPUT.start("Information", indent=2)
 
-    for tagname, value in info_json.items():
-        write_xml(tagname, data=value, close=True, indent=4)
+    for tagname, value in ordered_items(info_json):
+        OUTPUT.element(tagname, data=value, indent=4)
 
-    write_xml("Information", indent=2, closing=True)
+    OUTPUT.end("Information", indent=2)
 
     INFO("Application Information Data: Done!")
 
 
+def page_selected(config, name):
+    """Check if page @name is selected for partial build
+    """
+    return not config.get("pages") or name in config["pages"]
+
+
+def used_resources(config):
+    """Return set of resource files used by selected pages
+        or None if all resources have to be written
+    """
+    if not config.get("pages"):
+        return None
+
+    pages_path = os.path.join(config["source"], constants.PAGES_FOLDER)
+    used = set()
+
+    for page in config["pages"]:
+        resources_path = os.path.join(pages_path, page, constants.RESOURCES_FILE)
+        if not SOURCE.exists(resources_path):
+            INFO("Can't find: %s; writing all resources", resources_path)
+            return None
+
+        with SOURCE.open(resources_path) as resources_file:
+            # listed file names are str, JSON has unicode
+            used.update(imap(encode, json_load(resources_file, critical=True)))
+
+    return used
+
+
+def iter_e2vdom(paths, key):
+    """Yield items of @key list from e2vdom files @paths.
+        Files are loaded one by one, so only one page
+        is kept in memory
+    """
+    for e2vdom_path in paths:
+        DEBUG("Open file: %s", e2vdom_path)
+
+        with SOURCE.open(e2vdom_path) as e2vdom_file:
+            items = json_load(e2vdom_file, critical=True)[key]
+
+        for item in items:
+            yield item
+
+
+def without(attrs, key):
+    """Return (name, value) pairs of @attrs except @key
+        in the same order as @attrs iterates them
+    """
+    return [(name, value) for name, value in attrs.iteritems() if name != key]
+
+
 @print_block_end
 def write_e2vdom(config):
 
     INFO("E2VDOM Data: Processing...")
 
-    write_xml("E2vdom", indent=2)
+    OUTPUT.start("E2vdom", indent=2)
 
     pages_path = os.path.join(config["source"], constants.PAGES_FOLDER)
 
-    all_events = []
-    all_actions = []
+    paths = []
+    names = SOURCE.listdir(pages_path)
+    if REPRODUCIBLE is not None:
+        names = sorted(names)
+
+    for name in names:
+        if not page_selected(config, name):
+            continue
 
-    for name in os.listdir(pages_path):
         e2vdom_path = os.path.join(pages_path, name, constants.E2VDOM_FILE)
 
-        if not os.path.exists(e2vdom_path):
+        if not SOURCE.exists(e2vdom_path):
             INFO("No file %s; skipping E2VDOM for %s", e2vdom_path, name)
             continue
-        else:
-            DEBUG("Open file: %s", e2vdom_path)
 
-        with open_file(e2vdom_path) as e2vdom_file:
-            e2vdom = json_load(e2vdom_file, critical=True)
-            all_events.extend(e2vdom["events"])
-            all_actions.extend(e2vdom["actions"])
+        paths.append(e2vdom_path)
 
     INFO("E2VDOM Data: Writing events")
 
-    write_xml("Events", indent=4)
+    OUTPUT.start("Events", indent=4)
 
-    for event in all_events:
-        actions = event.pop("actions", [])
-        write_xml("Event", attrs=event, indent=6)
+    for event in iter_e2vdom(paths, "events"):
+        OUTPUT.start("Event", without(event, "actions"), indent=6)
 
-        for action in actions:
-            write_xml(
-                "Action",
-                attrs={"ID": action},
-                indent=8,
-                data="",
-                close=True
-            )
+        for action in event.get("actions", []):
+            OUTPUT.element("Action", {"ID": action}, indent=8)
 
-        write_xml("Event", indent=6, closing=True)
+        OUTPUT.end("Event", indent=6)
 
-    write_xml("Events", indent=4, closing=True)
+    OUTPUT.end("Events", indent=4)
 
     INFO("E2VDOM Data: Events done!")
     INFO("E2VDOM Data: Writing actions")
 
-    write_xml("Actions", indent=4)
-
-    for action in all_actions:
+    OUTPUT.start("Actions", indent=4)
 
-        params = action.pop("Params", [])
-        write_xml("Action", attrs=action, indent=6)
+    for action in iter_e2vdom(paths, "actions"):
+        OUTPUT.start("Action", without(action, "Params"), indent=6)
 
-        for key, value in params:
-            write_xml(
-                "Parameter",
-                attrs={"ScriptName": key},
-                indent=8,
-                data=value,
-                close=True
-            )
+        for key, value in action.get("Params", []):
+            OUTPUT.element("Parameter", {"ScriptName": key}, value, indent=8)
 
-        write_xml("Action", indent=6, closing=True)
+        OUTPUT.end("Action", indent=6)
 
-    write_xml("Actions", indent=4, closing=True)
-    write_xml("E2vdom", indent=2, closing=True)
+    OUTPUT.end("Actions", indent=4)
+    OUTPUT.end("E2vdom", indent=2)
 
     INFO("E2VDOM Data: Actions done!")
     INFO("E2VDOM Data: Done!")
@@ -160,30 +619,26 @@ def write_libraries(config):
     INFO("Libraries Data: Processing...")
 
     libs_path = os.path.join(config["source"], constants.LIBRARIES_FOLDER)
-    if not os.path.exists(libs_path):
+    entries = scan(libs_path)
+    if entries is None:
         CRITICAL("Can't find: {}".format(libs_path))
         emergency_exit()
 
-    write_xml("Libraries", indent=2)
+    OUTPUT.start("Libraries", indent=2)
 
-    files = list(set(os.listdir(libs_path)) - set(constants.RESERVED_NAMES))
-    for lib_name in sorted(files):
+    for lib_name in list_files(entries):
         lib_path = os.path.join(libs_path, lib_name)
 
-        if not os.path.isfile(lib_path):
-            continue
-
         DEBUG("Open file: %s", lib_path)
-        with open_file(lib_path) as lib_f:
-            write_xml(
-                tagname="Library",
-                attrs={"Name": lib_name.split(".", 1)[0]},
-                indent=4,
-                data=lib_f.read(),
-                close=True
+        with SOURCE.open(lib_path) as lib_f:
+            OUTPUT.element(
+                "Library",
+                {"Name": lib_name.split(".", 1)[0]},
+                lib_f.read(),
+                indent=4
             )
 
-    write_xml("Libraries", indent=2, closing=True)
+    OUTPUT.end("Libraries", indent=2)
     INFO("Libraries Data: Done!")
 
 
@@ -193,26 +648,31 @@ def write_resources(config):
     INFO("Resources Data: Processing...")
 
     resources_path = os.path.join(config["source"], constants.RESOURCES_FOLDER)
-    if not os.path.exists(resources_path):
+    files = resource_files(config)
+    if files is None:
         CRITICAL("Can't find: {}".format(resources_path))
         emergency_exit()
 
-    write_xml("Resources", indent=2)
+    OUTPUT.start("Resources", indent=2)
 
-    files = list(set(os.listdir(resources_path)) - set(constants.RESERVED_NAMES))
-    for res_name in sorted(files):
-        res_path = os.path.join(resources_path, res_name)
+    if config.get("no_resources"):
+        INFO("Resources Data: Skipped")
+        OUTPUT.end("Resources", indent=2)
+        return
 
-        if not os.path.isfile(res_path):
+    elements = []
+    for res_name in files:
+        if resource_guid(res_name) in RESOURCE_MAP:
             continue
 
+        res_path = os.path.join(resources_path, res_name)
         raw_name = res_name.split("_", 2)
 
         try:
             res_guid = UUID(raw_name[0])
 
         except ValueError:
-            res_guid = gen_guid()
+            res_guid = fallback_guid(res_path)
             res_type = res_name.rsplit(".", 1)
             res_type = res_type[1] if len(res_type) == 2 else "res"
 
@@ -226,17 +686,18 @@ def write_resources(config):
             "Type": res_type
         }
 
-        DEBUG("Open file: %s", res_path)
-        with open_file(res_path) as res_f:
-            write_xml(
-                tagname="Resource",
-                attrs=attrs,
-                indent=4,
-                data=base64.b64encode(res_f.read()),
-                close=True
-            )
+        elements.append(("Resource", attrs, 4, res_path))
+
+    # hashing reads every resource once more, so it's opt-in;
+    # digests of collapsed resources are known already
+    digests = None
+    if config.get("dedupe") or config.get("collapse_duplicates"):
+        paths = [element[3] for element in elements]
+        digests = file_digests(paths, config.get("jobs", 1))
+        report_duplicates(paths, digests)
 
-    write_xml("Resources", indent=2, closing=True)
+    write_encoded_all(elements, config.get("jobs", 1), digests)
+    OUTPUT.end("Resources", indent=2)
     INFO("Resources Data: Done!")
 
 
@@ -244,27 +705,28 @@ def write_resources(config):
 def write_databases(config):
     INFO("Databases Data: Processing...")
 
+    if config.get("no_databases"):
+        INFO("Databases Data: Skipped")
+        return
+
     dbs_path = os.path.join(config["source"], constants.DATABASES_FOLDER)
-    if not os.path.exists(dbs_path):
+    entries = scan(dbs_path)
+    if entries is None:
         DEBUG("Can't find: {}".format(dbs_path))
         return
 
-    write_xml("Databases", indent=2)
+    OUTPUT.start("Databases", indent=2)
 
-    files = list(set(os.listdir(dbs_path)) - set(constants.RESERVED_NAMES))
-    for db_name in sorted(files):
+    elements = []
+    for db_name in list_files(entries):
         db_path = os.path.join(dbs_path, db_name)
-
-        if not os.path.isfile(db_path):
-            continue
-
         raw_name = db_name.split("_", 1)
 
         try:
             db_guid = UUID(raw_name[0])
 
         except ValueError:
-            db_guid = gen_guid()
+            db_guid = fallback_guid(db_path)
 
         raw_name = raw_name[-1].split(".", 1)
         db_name = raw_name[0]
@@ -276,17 +738,10 @@ def write_databases(config):
             "Type": db_type
         }
 
-        DEBUG("Open file: %s", db_path)
-        with open_file(db_path) as db_f:
-            write_xml(
-                tagname="Database",
-                attrs=attrs,
-                indent=4,
-                data=base64.b64encode(db_f.read()),
-                close=True
-            )
+        elements.append(("Database", attrs, 4, db_path))
 
-    write_xml("Databases", indent=2, closing=True)
+    write_encoded_all(elements, config.get("jobs", 1))
+    OUTPUT.end("Databases", indent=2)
     INFO("Databases Data: Done!")
 
 
@@ -297,24 +752,29 @@ def write_structure(config):
 
     structure_path = os.path.join(config["source"], constants.STRUCT_FILE)
 
-    if not os.path.exists(structure_path):
+    if not SOURCE.exists(structure_path):
         ERROR("Can't find: {}".format(structure_path))
-        write_xml("Structure", indent=2, close=True)
+        OUTPUT.empty("Structure", indent=2)
         return
 
-    write_xml("Structure", indent=2)
+    OUTPUT.start("Structure", indent=2)
 
-    with open_file(structure_path) as struct_file:
+    with SOURCE.open(structure_path) as struct_file:
         struct_json = json_load(struct_file, critical=True)
 
     for obj in struct_json:
-        write_xml("Object", attrs=obj, data="", close=True, indent=4)
+        OUTPUT.element("Object", obj, indent=4)
 
-    write_xml("Structure", indent=2, closing=True)
+    OUTPUT.end("Structure", indent=2)
 
     INFO("Structure Data: Done!")
 
 
+def write_stubs(config):
+    OUTPUT.write("""  <Structure/>\n""")
+    OUTPUT.write("""  <Backupfiles/>\n""")
+
+
 @print_block_end
 def write_security(config):
 
@@ -322,71 +782,59 @@ def write_security(config):
 
     security_path = os.path.join(config["source"], constants.SECURITY_FOLDER)
 
-    if not os.path.exists(security_path):
+    if not SOURCE.exists(security_path):
         INFO("Can't find: {}".format(security_path))
         return
 
     groups_and_users_path = \
         os.path.join(security_path, constants.USERS_GROUPS_FILE)
 
-    if os.path.exists(groups_and_users_path):
-        with open_file(groups_and_users_path) as ug_file:
+    if SOURCE.exists(groups_and_users_path):
+        with SOURCE.open(groups_and_users_path) as ug_file:
             ug_json = json_load(ug_file, critical=True)
     else:
         ug_json = {}
 
-    write_xml("Security", indent=2)
-    write_xml("Groups", indent=4, close=True)
-    write_xml("Users", indent=4)
+    OUTPUT.start("Security", indent=2)
+    OUTPUT.empty("Groups", indent=4)
+    OUTPUT.start("Users", indent=4)
 
     INFO("Security Data: Writing users")
 
     for user in ug_json.get("users", []):
 
-        write_xml("User", indent=6)
+        OUTPUT.start("User", indent=6)
 
-        for key, value in user.items():
+        for key, value in ordered_items(user):
             if key == "Rights":
-                write_xml("Rights", indent=8)
+                OUTPUT.start("Rights", indent=8)
                 for right in value:
-                    write_xml(
-                        "Right",
-                        attrs=right,
-                        indent=10,
-                        close=True
-                    )
-                write_xml("Rights", indent=8, closing=True)
+                    OUTPUT.empty("Right", right, indent=10)
+                OUTPUT.end("Rights", indent=8)
 
             else:
-                write_xml(
-                    key,
-                    data=value,
-                    indent=8,
-                    close=True,
-                    force_cdata=True
-                )
+                OUTPUT.element(key, data=value, indent=8, force_cdata=True)
 
-        write_xml("User", indent=6, closing=True)
+        OUTPUT.end("User", indent=6)
 
-    write_xml("Users", indent=4, closing=True)
+    OUTPUT.end("Users", indent=4)
 
     INFO("Security Data: Users done!")
     INFO("Security Data: Writing LDAP")
 
     ldap_path = os.path.join(security_path, constants.LDAP_LDIF)
-    if os.path.exists(ldap_path):
-        with open_file(ldap_path) as ldap_file:
-            write_xml(
+    if SOURCE.exists(ldap_path):
+        with SOURCE.open(ldap_path) as ldap_file:
+            OUTPUT.element(
                 "LDAP",
-                indent=4,
                 data=base64.b64encode(ldap_file.read()),
-                close=True
+                indent=4
             )
 
     else:
-        write_xml("LDAP", indent=4, data="", close=True)
+        OUTPUT.element("LDAP", indent=4)
 
-    write_xml("Security", indent=2, closing=True)
+    OUTPUT.end("Security", indent=2)
 
     INFO("Security Data: Done!")
 
@@ -398,55 +846,247 @@ def write_pages(config):
 
     pages_path = os.path.join(config["source"], constants.PAGES_FOLDER)
 
-    if not os.path.exists(pages_path):
+    if not SOURCE.exists(pages_path):
         CRITICAL("Can't find: {}".format(pages_path))
         emergency_exit()
 
-    write_xml("Objects", indent=2)
-    for page in sorted(os.listdir(pages_path)):
-        walk(pages_path, page, indent=4)
+    OUTPUT.start("Objects", indent=2)
+
+    pages = [
+        page for page in sorted(SOURCE.listdir(pages_path))
+        if page_selected(config, page)
+    ]
+    if config.get("jobs", 1) > 1 or CACHE:
+        write_pages_buffered(pages_path, pages, config.get("jobs", 1))
+
+    else:
+        for page in pages:
+            walk(OUTPUT, pages_path, page, indent=4)
 
-    write_xml("Objects", indent=2, closing=True)
+    OUTPUT.end("Objects", indent=2)
 
 
     actions_path = os.path.join(config["source"], constants.APP_ACTIONS_FOLDER)
-    write_actions(actions_path, 2)
+    write_actions(OUTPUT, actions_path, 2)
 
     INFO("Pages Data: Done!")
 
 
-def walk(path, name, indent):
+def page_state(page_path):
+    """Return sorted list of [relative path, signature]
+        for every file of page subtree
+    """
+    state = []
+    stack = [""]
+
+    while stack:
+        rel_path = stack.pop()
+        path = os.path.join(page_path, rel_path)
+
+        for name, entry in SOURCE.scan(path).iteritems():
+            node_rel = os.path.join(rel_path, name)
+
+            if entry.is_dir():
+                stack.append(node_rel)
+
+            else:
+                state.append([node_rel, SOURCE.signature(os.path.join(path, name))])
+
+    state.sort()
+    return state
+
+
+def load_cached_page(key, page_path, state):
+    """Return (data, objs) of cached page if page files
+        are the same as at the time of caching
+    """
+    meta = CACHE.read_json(key)
+    if not meta or [entry[0] for entry in meta["files"]] != \
+            [entry[0] for entry in state]:
+
+        return None
+
+    updated = False
+    for entry, (rel_path, signature) in izip(meta["files"], state):
+        if entry[1] == signature:
+            continue
+
+        # file was touched, but content can be the same
+        if entry[2] != SOURCE.digest(os.path.join(page_path, rel_path)):
+            return None
+
+        entry[1] = signature
+        updated = True
+
+    data = CACHE.read(key, ".xml")
+    if data is None:
+        return None
+
+    if updated:
+        CACHE.write_json(key, meta)
+
+    return data, meta["objs"]
+
+
+def store_cached_page(key, page_path, state, data, objs):
+    """Save rendered page with digests of its files
+    """
+    files = [
+        [rel_path, signature, SOURCE.digest(os.path.join(page_path, rel_path))]
+        for rel_path, signature in state
+    ]
+
+    CACHE.write(key, ".xml", data)
+    CACHE.write_json(key, {"files": files, "objs": objs})
+
+
+def render_page(args):
+    """Render page subtree into buffer or take it from cache.
+        Called in worker thread
+    """
+    pages_path, page = args
+    page_path = os.path.join(pages_path, page)
+
+    if CACHE and SOURCE.isdir(page_path):
+        key = make_key(
+            SOURCE.location(pages_path), page,
+            "reproducible" if REPRODUCIBLE is not None else ""
+        )
+        state = page_state(page_path)
+
+        known = RENDERED.get(key)
+        if known and known[0] == state:
+            DEBUG("Page %s is not changed", page)
+            return known[1:]
+
+        cached = load_cached_page(key, page_path, state)
+        if cached:
+            DEBUG("Page %s taken from cache", page)
+            if KEEP_RENDERED:
+                RENDERED[key] = (state,) + cached
+
+            return cached
+
+    buffer = cStringIO.StringIO()
+    out = XMLEmitter(buffer, sort_attrs=REPRODUCIBLE is not None)
+    LOCAL.objs = {}
+
+    try:
+        walk(out, pages_path, page, indent=4)
+        out.flush()
+        result = buffer.getvalue(), LOCAL.objs
+
+    except SystemExit:
+        return None
+
+    finally:
+        del LOCAL.objs
+
+    if CACHE and SOURCE.isdir(page_path):
+        store_cached_page(key, page_path, state, *result)
+        if KEEP_RENDERED:
+            RENDERED[key] = (state,) + result
+
+    return result
+
+
+def write_pages_buffered(pages_path, pages, jobs):
+    """Read and render pages (in @jobs threads if @jobs > 1)
+        and write them in the same order as serial build does
+    """
+    DEBUG("Rendering %s pages in %s threads", len(pages), jobs)
+
+    pool = ThreadPool(jobs) if jobs > 1 else None
+    rendered = (pool.imap if pool else imap)(
+        render_page, ((pages_path, page) for page in pages)
+    )
+
+    try:
+        for page, result in izip(pages, rendered):
+            if result is None:
+                emergency_exit()
+
+            data, objs = result
+
+            # Object GUIDs of page clash with previous pages:
+            # render it again to skip duplicates exactly as serial build does
+            if any(key in OBJS for key in objs):
+                DEBUG("Duplicate GUIDs in page %s, rendering it again", page)
+                walk(OUTPUT, pages_path, page, indent=4)
+                continue
+
+            OBJS.update(objs)
+            OUTPUT.write(data)
+
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+
+def walk(out, path, name, indent):
+    """Write object of folder @path/@name with all its children.
+        Tree is traversed with explicit stack, so its depth
+        is not limited by recursion limit
+    """
+    objs = getattr(LOCAL, "objs", OBJS)
+    stack = [(FOLDER, path, name, indent)]
+
+    while stack:
+        kind, path, name, indent = stack.pop()
+
+        if kind == FILE:
+            write_object(out, path, name, indent)
+
+        elif kind == TAIL:
+            # @name is attributes of object opened by write_folder
+            out.end("Objects", indent=indent+2)
+            write_attributes(out, name, indent+2)
+            out.end("Object", indent=indent)
+
+        else:
+            stack.extend(reversed(write_folder(out, path, name, indent, objs)))
+
+
+def write_folder(out, path, name, indent, objs):
+    """Open object of folder @path/@name and write its actions.
+        Return stack entries for its children and closing tail
+    """
     new_path = os.path.join(path, name)
     actions_folder = "Actions-{}".format(name)
+    entries = scan(new_path) or {}
 
     info_path = os.path.join(new_path, constants.INFO_FILE)
-    if not os.path.exists(info_path):
+    if constants.INFO_FILE not in entries:
         CRITICAL("Can't find: {}".format(info_path))
         emergency_exit()
 
-    with open_file(info_path) as info_file:
+    with SOURCE.open(info_path) as info_file:
         info_json = json_load(info_file, critical=True)
 
     attrs = info_json["attrs"]
     if attrs is not None and 'ID' in attrs:
         id = attrs['ID']
-        if id in OBJS:
+        if id in objs:
             ERROR("Encountered duplicate GUID: {duplicate} duplicates {origin}: Ignoring {duplicate}".format(
-                duplicate=name, origin=OBJS[id]
+                duplicate=name, origin=objs[id]
             ))
-            return
+            return []
         else:
-            OBJS[id] = name
+            objs[id] = name
 
-    write_xml("Object", attrs=attrs, indent=indent)
-    write_actions(os.path.join(new_path, actions_folder), indent+2)
-    write_xml("Objects", indent=indent+2)
+    out.start("Object", attrs, indent=indent)
+    write_actions(
+        out, os.path.join(new_path, actions_folder), indent+2,
+        None if actions_folder in entries and entries[actions_folder].is_dir() else {}
+    )
+    out.start("Objects", indent=indent+2)
 
 
     childs_order_path = os.path.join(new_path, constants.CHILDS_ORDER)
 
-    if os.path.exists(childs_order_path):
-        with open(childs_order_path) as f:
+    if constants.CHILDS_ORDER in entries:
+        with SOURCE.open(childs_order_path) as f:
             names = json_load(f, default=[], critical=False)
             names = map(lambda s: s.lower(), names)
             childs_order = dict(zip(names, xrange(len(names))))
@@ -463,42 +1103,40 @@ def walk(path, name, indent):
 
         return [childs_order.get(key, max_value), name]
 
-    nodes = list(set(os.listdir(new_path)) - set(constants.RESERVED_NAMES) - {actions_folder})
+    nodes = list(set(entries) - set(constants.RESERVED_NAMES) - {actions_folder})
     nodes = [node for node in nodes if not constants.RESERVED_NAMES_REGEXP.match(node)]
     ordered_nodes = sorted(nodes, key=key_func)
 
-    for name in ordered_nodes:
-        if os.path.isdir(os.path.join(new_path, name)):
-            walk(new_path, name, indent+4)
-
-        else:
-            write_object(new_path, name, indent+4)
+    children = [
+        (FOLDER if entries[name].is_dir() else FILE, new_path, name, indent+4)
+        for name in ordered_nodes
+    ]
+    children.append((TAIL, new_path, info_json["attributes"], indent))
+    return children
 
-    write_xml("Objects", indent=indent+2, closing=True)
-    write_attributes(info_json["attributes"], indent+2)
-    write_xml("Object", indent=indent, closing=True)
 
+def write_actions(out, path, indent, entries=None):
+    """Write actions of folder @path. @entries is result
+        of scan(path) if it is already known
+    """
+    if entries is None:
+        entries = scan(path) or {}
 
-def write_actions(path, indent):
     actions_map_path = os.path.join(path, constants.MAP_FILE)
 
-    if not os.path.exists(actions_map_path):
+    if constants.MAP_FILE not in entries:
         INFO("Can't find: %s; skipping Actions", actions_map_path)
-        write_xml("Actions", indent=indent)
-        write_xml("Actions", indent=indent, closing=True)
+        out.start("Actions", indent=indent)
+        out.end("Actions", indent=indent)
         return
 
-    with open_file(actions_map_path) as actions_map_file:
+    with SOURCE.open(actions_map_path) as actions_map_file:
         actions_map = json_load(actions_map_file, critical=True)
 
-    write_xml("Actions", indent=indent)
+    out.start("Actions", indent=indent)
 
-    for action_name in sorted(os.listdir(path)):
+    for action_name in list_files(entries):
         action_path = os.path.join(path, action_name)
-        if not os.path.isfile(action_path) or \
-                action_name in constants.RESERVED_NAMES:
-
-            continue
 
         attrs = actions_map.get(action_name, None)
         if not attrs:
@@ -506,25 +1144,24 @@ def write_actions(path, indent):
                 "Top": "",
                 "State": "",
                 "Left": "",
-                "ID": str(gen_guid()),
+                "ID": str(fallback_guid(action_path)),
                 "Name": action_name.split(".", 1)[0],
             }
 
-        with open_file(action_path) as action_f:
-            write_xml(
-                tagname="Action",
-                attrs=attrs,
+        with SOURCE.open(action_path) as action_f:
+            out.element(
+                "Action",
+                attrs,
+                action_f.read(),
                 indent=indent+2,
-                data=action_f.read(),
-                close=True,
                 force_cdata=True
             )
 
-    write_xml("Actions", indent=indent, closing=True)
+    out.end("Actions", indent=indent)
 
 
-def write_object(path, name, indent):
-    with open_file(os.path.join(path, name)) as obj_file:
+def write_object(out, path, name, indent):
+    with SOURCE.open(os.path.join(path, name)) as obj_file:
         obj_json = json_load(obj_file, critical=True)
 
     if "Type" in obj_json["attrs"] \
@@ -532,63 +1169,269 @@ def write_object(path, name, indent):
         and "source_file_name" in obj_json["attrs"]:
             source_file_name = obj_json["attrs"]["source_file_name"]
             del obj_json["attrs"]["source_file_name"]
-            with open_file(os.path.join(path, source_file_name)) as source_file:
+            with SOURCE.open(os.path.join(path, source_file_name)) as source_file:
                 obj_json["attributes"]["source"] = clean_data(source_file.read()).decode('utf-8')
 
-    write_xml("Object", attrs=obj_json["attrs"], indent=indent)
-    write_xml("Actions", indent=indent+2, data="", close=True)
-    write_xml("Objects", indent=indent+2, data="", close=True)
-    write_attributes(obj_json["attributes"], indent+2)
-    write_xml("Object", indent=indent, closing=True)
+    out.start("Object", obj_json["attrs"], indent=indent)
+    out.element("Actions", indent=indent+2)
+    out.element("Objects", indent=indent+2)
+    write_attributes(out, obj_json["attributes"], indent+2)
+    out.end("Object", indent=indent)
 
 
-def write_attributes(attributes, indent):
-    write_xml("Attributes", indent=indent)
-    for key, value in attributes.items():
+def write_attributes(out, attributes, indent):
+    out.start("Attributes", indent=indent)
+    for key, value in ordered_items(attributes):
         if isinstance(value, list):
             value = "\n".join(value)
-        write_xml(
+        out.element(
             "Attribute",
-            attrs={"Name": key},
-            data=clean_data(encode(value)),
-            indent=indent+2,
-            close=True
+            {"Name": key},
+            normalize_text(value),
+            indent=indent+2
         )
-    write_xml("Attributes", indent=indent, closing=True)
+    out.end("Attributes", indent=indent)
+
+
+# Sections of application XML in order
+SECTIONS = (
+    write_app_info,
+    write_pages,
+    write_e2vdom,
+    write_libraries,
+    # write_structure,
+    write_stubs,
+    write_resources,
+    write_databases,
+    write_security,
+)
+
+
+def render_section(section, config, path):
+    """Render @section into file @path. Called in child process
+    """
+    global OUTPUT_IO
+    global OUTPUT
+
+    # don't share pipes of source with parent process
+    SOURCE.reopen()
+
+    OUTPUT_IO = open_file(path, "wb")
+    OUTPUT = new_emitter(OUTPUT_IO)
+
+    section(config)
+
+    OUTPUT.flush()
+    OUTPUT_IO.close()
+
+
+def write_sections_parallel(config):
+    """Render every section in its own process into temporary
+        file and concatenate files in order of sections
+    """
+    target_dir = os.path.dirname(os.path.abspath(config["target"]["path"]))
+    temp_dir = tempfile.mkdtemp(prefix=".sections-", dir=config.get("temp_path") or target_dir)
+
+    try:
+        parts = []
+        for index, section in enumerate(SECTIONS):
+            path = os.path.join(temp_dir, "{:02}.xml".format(index))
+            process = multiprocessing.Process(
+                target=render_section,
+                args=(section, config, path),
+                name=section.__name__
+            )
+            process.start()
+            parts.append((process, path))
+
+        failed = False
+        for process, path in parts:
+            process.join()
+            if process.exitcode != 0:
+                CRITICAL("Section %s failed", process.name)
+                failed = True
+
+        if failed:
+            emergency_exit()
+
+        for process, path in parts:
+            with open_file(path) as src:
+                OUTPUT.copy_from(src)
+
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+@print_block_end
+def check_sources(config):
+    """Validate whole source tree and stop
+        if there are any problems
+    """
+    INFO("Checking sources...")
+
+    # checks mostly wait for reading, so use at least 4 threads
+    problems, warnings, checked = validate(SOURCE, config["source"], max(config.get("jobs", 1), 4))
+    for warning in warnings:
+        WARNING(warning)
+
+    for problem in problems:
+        ERROR(problem)
+
+    if problems:
+        CRITICAL("%s problems found in %s files", len(problems), checked)
+        emergency_exit()
+
+    INFO("Sources checked: %s files", checked)
 
 
 def build(config):
     """Build function
     """
     global OUTPUT_IO
+    global OUTPUT
+    global SOURCE
     global OBJS
+    global CACHE
+    global REPRODUCIBLE
+
+    if config.get("git"):
+        SOURCE = GitTree(config["git"]["repo"], config["git"]["revision"])
+
+    elif config.get("make"):
+        SOURCE = load_overlay(config["make"])
+
+    else:
+        SOURCE = FileSystemSource()
+
+    if config.get("cache"):
+        CACHE = FileCache(**config["cache"])
 
-    if not os.path.isdir(config["source"]):
+    REPRODUCIBLE = config["source"] if config.get("reproducible") else None
+
+    if not SOURCE.isdir(config["source"]):
         ERROR("Can't find %s", config["source"])
         return
 
-    OUTPUT_IO = open_file(config["target"]["path"], "wb")
-    OUTPUT_IO.write(
+    if config.get("check"):
+        check_sources(config)
+
+    for page in config.get("pages") or []:
+        page_path = os.path.join(config["source"], constants.PAGES_FOLDER, page)
+        if not SOURCE.isdir(page_path):
+            CRITICAL("Can't find page: %s", page_path)
+            emergency_exit()
+
+    RESOURCE_MAP.clear()
+    if config.get("collapse_duplicates") and not config.get("no_resources"):
+        collapse_duplicates(config)
+
+    OUTPUT_IO = open_output(config["target"]["path"], config.get("compress_level"))
+    if REPRODUCIBLE is not None:
+        OUTPUT_IO = DigestStream(OUTPUT_IO)
+
+    OUTPUT = new_emitter(OUTPUT_IO)
+    OUTPUT.write(
         """<?xml version="1.0" encoding="utf-8"?>\n"""
         """<Application>\n"""
     )
     OBJS = {}
 
-    write_app_info(config)
-    write_pages(config)
-    write_e2vdom(config)
-    write_libraries(config)
-    # write_structure(config)
+    if config.get("sections"):
+        write_sections_parallel(config)
 
-    OUTPUT_IO.write("""  <Structure/>\n""")
-    OUTPUT_IO.write("""  <Backupfiles/>\n""")
-
-    write_resources(config)
-    write_databases(config)
-    write_security(config)
+    else:
+        for section in SECTIONS:
+            section(config)
 
-    OUTPUT_IO.write("</Application>")
+    OUTPUT.write("</Application>")
+    OUTPUT.flush()
     OUTPUT_IO.close()
+    SOURCE.close()
+
+    if REPRODUCIBLE is not None:
+        INFO("Application XML digest: sha256:%s", OUTPUT_IO.hexdigest())
+
+    if CACHE:
+        CACHE.evict()
+
+
+def run_build(config):
+    """Build application, failed build doesn't stop watch mode
+    """
+    started = time.time()
+
+    try:
+        build(config)
+
+    except SystemExit:
+        for resource in (OUTPUT_IO, SOURCE):
+            try:
+                resource.close()
+
+            except (Exception, SystemExit):
+                pass
+
+        ERROR("Build failed")
+        return
+
+    INFO("Application XML built in %.2f seconds: %s",
+         time.time() - started, config["target"]["path"])
+
+
+def watch(config):
+    """Rebuild application on every change of sources until
+        interrupted. Untouched pages are taken from memory,
+        digests of files are remembered until they change and
+        encoded resources are kept in cache, so only changed
+        parts are read and built again
+    """
+    global KEEP_RENDERED
+
+    if config.get("git"):
+        CRITICAL("Can't watch git revision")
+        emergency_exit()
+
+    if config.get("make"):
+        CRITICAL("Can't watch make config")
+        emergency_exit()
+
+    temp_cache = None
+    if not config.get("cache"):
+        temp_cache = tempfile.mkdtemp(prefix="vdom2fs-watch-")
+        config["cache"] = {"path": temp_cache, "max_size": 1024 << 20}
+
+    KEEP_RENDERED = True
+    # temporary files of build must not trigger rebuild
+    config["temp_path"] = config["cache"]["path"]
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt()
+
+    signal.signal(signal.SIGTERM, stop)
+
+    ignore = [config["target"]["path"], config["cache"]["path"]]
+    watcher = create_watcher(config["source"], ignore, config["poll_interval"])
+
+    try:
+        run_build(config)
+
+        while True:
+            INFO("Waiting for changes in %s (Ctrl+C to stop)", config["source"])
+            changed = wait_changes(watcher, config["debounce"])
+
+            for path in sorted(changed):
+                DEBUG("Changed: %s", path)
+
+            INFO("%s changes, rebuilding", len(changed))
+            run_build(config)
+
+    except KeyboardInterrupt:
+        INFO("Watching stopped")
+
+    finally:
+        watcher.close()
+        if temp_cache:
+            shutil.rmtree(temp_cache, ignore_errors=True)
 
 
 def main():
@@ -597,10 +1440,77 @@ def main():
     args_parser = argparse.ArgumentParser()
 
     args_parser.add_argument("source", type=str,
-                             help="aplication source folder")
+                             help="aplication source folder "
+                                  "(git repository with --git-revision, "
+                                  "make.py config with --make)")
 
     args_parser.add_argument("target", type=str,
-                             help="target XML file")
+                             help="target XML file, "
+                                  "*.xml.gz and *.xml.zst are compressed")
+
+    args_parser.add_argument("--compress-level", type=int,
+                             help="compression level for compressed target")
+
+    args_parser.add_argument("-g", "--git-revision", type=str,
+                             help="read sources from git revision, "
+                                  "e.g. 'v1.0' or 'v1.0:app'")
+
+    args_parser.add_argument("-m", "--make", action="store_true",
+                             help="build application which make.py would "
+                                  "create from config, without copying files")
+
+    args_parser.add_argument("-j", "--jobs", type=int, default=1,
+                             help="read and render pages in JOBS threads, "
+                                  "read and encode resources in JOBS threads")
+
+    args_parser.add_argument("-s", "--sections", action="store_true",
+                             help="render sections of XML in parallel "
+                                  "processes and concatenate them")
+
+    args_parser.add_argument("--check", action="store_true",
+                             help="validate all sources before build "
+                                  "and report every problem found")
+
+    args_parser.add_argument("-p", "--pages", type=str,
+                             help="comma separated pages to build, only "
+                                  "their resources and E2VDOM are written")
+
+    args_parser.add_argument("--no-resources", action="store_true",
+                             help="don't write resources")
+
+    args_parser.add_argument("--no-databases", action="store_true",
+                             help="don't write databases")
+
+    args_parser.add_argument("--dedupe", action="store_true",
+                             help="report identical resources and encode "
+                                  "them once (reads resources twice)")
+
+    args_parser.add_argument("--collapse-duplicates", action="store_true",
+                             help="write one copy of identical resources "
+                                  "and rewrite references to the others")
+
+    args_parser.add_argument("-r", "--reproducible", action="store_true",
+                             help="sorted attributes, GUIDs derived from "
+                                  "file names instead of random ones "
+                                  "and digest of output")
+
+    args_parser.add_argument("-w", "--watch", action="store_true",
+                             help="rebuild on every change of sources")
+
+    args_parser.add_argument("--debounce", type=float, default=0.5,
+                             help="seconds without changes before rebuild "
+                                  "in watch mode")
+
+    args_parser.add_argument("--poll-interval", type=float, default=1.0,
+                             help="seconds between checks when inotify "
+                                  "is not available")
+
+    args_parser.add_argument("-c", "--cache", type=str,
+                             help="cache folder for rendered pages "
+                                  "and encoded resources")
+
+    args_parser.add_argument("--cache-size", type=int, default=1024,
+                             help="cache size limit in megabytes")
 
     args_parser.add_argument("-v", "--verbosity", action="count",
                              help="be more verbose",
@@ -623,10 +1533,43 @@ def main():
         "target": {
             "path": args.target,
         },
-        "source": args.source
+        "source": args.source,
+        "jobs": args.jobs,
+        "sections": args.sections,
+        "check": args.check,
+        "reproducible": args.reproducible,
+        "pages": args.pages.split(",") if args.pages else None,
+        "no_resources": args.no_resources,
+        "no_databases": args.no_databases,
+        "dedupe": args.dedupe,
+        "collapse_duplicates": args.collapse_duplicates,
+        "compress_level": args.compress_level,
+        "debounce": args.debounce,
+        "poll_interval": args.poll_interval
     }
 
+    if args.cache:
+        config["cache"] = {
+            "path": args.cache,
+            "max_size": args.cache_size << 20
+        }
+
+    if args.git_revision:
+        config["git"] = {
+            "repo": args.source,
+            "revision": args.git_revision
+        }
+        config["source"] = ""
+
+    elif args.make:
+        config["make"] = args.source
+        config["source"] = ""
+
     # Main process starting
+    if args.watch:
+        watch(config)
+        return
+
     build(config)
 
     INFO("\nPath to application XML:\n{}".format(config["target"]["path"]))
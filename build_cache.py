@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import hashlib
+import json
+import os
+import time
+
+from helpers import DEBUG, INFO, ERROR, uuid
+
+
+# Change it when rendering changes to invalidate old entries
+CACHE_VERSION = "1"
+
+
+def make_key(*parts):
+    """Return hex key for cache entry
+    """
+    sha = hashlib.sha1(CACHE_VERSION)
+    for part in parts:
+        sha.update(part.encode("utf-8") if isinstance(part, unicode) else part)
+        sha.update("\0")
+
+    return sha.hexdigest()
+
+
+class FileCache(object):
+    """Directory of cached files evicted by least recent use
+        when total size exceeds @max_size bytes
+    """
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def entry_path(self, key, ext):
+        """Return path of entry file, entries are spread to subfolders
+        """
+        return os.path.join(self.path, key[:2], key + ext)
+
+    def get(self, key, ext):
+        """Return path of entry or None. Entry is marked as recently used
+        """
+        path = self.entry_path(key, ext)
+        try:
+            os.utime(path, None)
+
+        except OSError:
+            return None
+
+        return path
+
+    def read(self, key, ext):
+        """Return content of entry or None
+        """
+        path = self.get(key, ext)
+        if not path:
+            return None
+
+        with open(path, "rb") as hdlr:
+            return hdlr.read()
+
+    def read_json(self, key, ext=".json"):
+        data = self.read(key, ext)
+        if data is None:
+            return None
+
+        try:
+            return json.loads(data)
+
+        except ValueError:
+            ERROR("Broken cache entry: %s", self.entry_path(key, ext))
+            return None
+
+    def write(self, key, ext, data):
+        """Atomically store @data (string or iterable of strings)
+        """
+        path = self.entry_path(key, ext)
+        folder = os.path.dirname(path)
+
+        if not os.path.isdir(folder):
+            try:
+                os.makedirs(folder)
+
+            except OSError:
+                # created by other thread
+                pass
+
+        tmp_path = "{}.{}.tmp".format(path, uuid())
+        with open(tmp_path, "wb") as hdlr:
+            if isinstance(data, basestring):
+                hdlr.write(data)
+
+            else:
+                for chunk in data:
+                    hdlr.write(chunk)
+
+        os.rename(tmp_path, path)
+        return path
+
+    def write_json(self, key, data, ext=".json"):
+        return self.write(key, ext, json.dumps(data))
+
+    def evict(self):
+        """Remove least recently used entries until cache fits @max_size
+        """
+        entries = []
+        total = 0
+
+        for cwd, dirs, files in os.walk(self.path):
+            for name in files:
+                path = os.path.join(cwd, name)
+                try:
+                    stat = os.stat(path)
+
+                except OSError:
+                    continue
+
+                # stale temporary files of interrupted builds
+                if name.endswith(".tmp") and stat.st_mtime < time.time() - 3600:
+                    os.remove(path)
+                    continue
+
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_size:
+            DEBUG("Cache %s: %s bytes", self.path, total)
+            return
+
+        entries.sort()
+        removed = 0
+
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+
+            try:
+                os.remove(path)
+
+            except OSError:
+                continue
+
+            total -= size
+            removed += 1
+
+        INFO("Cache %s: %s entries evicted, %s bytes left",
+             self.path, removed, total)
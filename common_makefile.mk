@@ -3,36 +3,52 @@ APP_NAME := $(shell basename "$$(pwd)")
 TMP_DIR := $(shell readlink -m ./build/tests)
 XML_FILE := ../vdom2fs/application.xml
 XML_FILE_BKP := ../vdom2fs/application_bkp.xml
-
-.PHONY: ask_file unpack_remote
+# Set to "gz" or "zst" to compile compressed application XML: make compile COMPRESS=gz
+COMPRESS ?=
+COMPILED_XML := ./build/$(APP_NAME)_compiled.xml$(if $(COMPRESS),.$(COMPRESS))
+# Set to 1 to link sources instead of copying them: make compile LINK=1
+LINK ?=
+# Set to 1 to update previous compiled folder: make compile INCREMENTAL=1
+INCREMENTAL ?=
+# Set to 1 to build XML straight from vdom2fs.conf without compiled folder: make compile FUSED=1
+FUSED ?=
+
+.PHONY: ask_file unpack_remote uncompressed_only
 
 compile:
 	mkdir -p ./build/tests/
-	rm -rf ./build/$(APP_NAME)*
+	rm -rf $(if $(INCREMENTAL),$(COMPILED_XML),./build/$(APP_NAME)*)
 
 	set -x && \
-		if [ -e vdom2fs.conf ]; then \
-			python ../vdom2fs/make.py -ve vdom2fs.conf ./build/$(APP_NAME)_compiled; \
-			python ../vdom2fs/build.py ./build/$(APP_NAME)_compiled ./build/$(APP_NAME)_compiled.xml; \
+		if [ -e vdom2fs.conf ] && [ -n "$(FUSED)" ]; then \
+			python ../vdom2fs/build.py --make vdom2fs.conf $(COMPILED_XML); \
+		elif [ -e vdom2fs.conf ]; then \
+			python ../vdom2fs/make.py -ve $(if $(LINK),--link) $(if $(INCREMENTAL),--incremental) vdom2fs.conf ./build/$(APP_NAME)_compiled; \
+			python ../vdom2fs/build.py ./build/$(APP_NAME)_compiled $(COMPILED_XML); \
 		else \
-			python ../vdom2fs/build.py . ./build/$(APP_NAME)_compiled.xml; \
+			python ../vdom2fs/build.py . $(COMPILED_XML); \
 		fi
 
 
-run13:
+# Containers install plain application XML
+uncompressed_only:
+	@test -z "$(COMPRESS)" || { echo "Containers need uncompressed XML, run without COMPRESS=$(COMPRESS)"; exit 1; }
+
+
+run13: uncompressed_only
 	-make compile
 
 	$(eval USER_DATA := "$(TMP_DIR)/vdom13_userdata/")
 	$(eval CONT_NAME := "vdom13$(APP_NAME)")
 	$(eval IMG_NAME := "vdom13$(APP_NAME)")
 	$(eval DOCKERFILE := "vdom2fs/dockerfile_13")
-	$(eval APP_XML := "./build/$(APP_NAME)_compiled.xml")
+	$(eval APP_XML := "$(COMPILED_XML)")
 
 	@mkdir -p "$(USER_DATA)"
 	-docker stop $(CONT_NAME)
 	-docker rm -f $(CONT_NAME)
 
-	tar -c ../$(DOCKERFILE) ./build/*.xml | docker build -f $(DOCKERFILE)  --build-arg APP_NAME=$(APP_NAME) -t $(IMG_NAME) -
+	tar -c ../$(DOCKERFILE) $(COMPILED_XML) | docker build -f $(DOCKERFILE)  --build-arg APP_NAME=$(APP_NAME) -t $(IMG_NAME) -
 	
 	set -x && \
 		docker run -it -d --name $(CONT_NAME) -v "$(USER_DATA)":/var/vdom $(IMG_NAME) && \
@@ -52,7 +68,7 @@ run13:
 	@echo Complete.
 
 
-run20:
+run20: uncompressed_only
 	-make compile
 
 	$(eval USER_DATA := "$(TMP_DIR)/vdom20_userdata/")
@@ -64,7 +80,7 @@ run20:
 	-docker stop $(CONT_NAME)
 	-docker rm -f $(CONT_NAME)
 	
-	tar -c ../$(DOCKERFILE) ./build/*.xml | docker build -f $(DOCKERFILE)  --build-arg APP_NAME=$(APP_NAME) -t $(IMG_NAME) -
+	tar -c ../$(DOCKERFILE) $(COMPILED_XML) | docker build -f $(DOCKERFILE)  --build-arg APP_NAME=$(APP_NAME) -t $(IMG_NAME) -
 
 	docker run -it -d --name $(CONT_NAME) -v "$(USER_DATA)":/var/vdom/ $(IMG_NAME)
 	
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import Queue
+import threading
+import zlib
+
+from helpers import DEBUG, CRITICAL, emergency_exit, open_file
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Compressed file extensions
+GZIP_EXT = ".gz"
+ZSTD_EXT = ".zst"
+
+# Default compression levels
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Max number of blocks waiting for compression
+QUEUE_SIZE = 16
+
+
+def compressor_for(path, level=None):
+    """Return compressor object with compress() and flush()
+        methods for file @path or None if @path is not
+        compressed file
+    """
+    if path.endswith(GZIP_EXT):
+        # 16 + MAX_WBITS: gzip header and trailer
+        return zlib.compressobj(
+            GZIP_LEVEL if level is None else level,
+            zlib.DEFLATED,
+            16 + zlib.MAX_WBITS
+        )
+
+    if path.endswith(ZSTD_EXT):
+        if not zstandard:
+            CRITICAL("Module 'zstandard' is required to write %s", path)
+            emergency_exit()
+
+        return zstandard.ZstdCompressor(
+            level=ZSTD_LEVEL if level is None else level
+        ).compressobj()
+
+    return None
+
+
+class CompressedFile(object):
+    """Write-only file compressing data on separate thread.
+        Written blocks are passed to compressing thread
+        through bounded queue, so rendering is blocked only
+        when compression falls far behind
+    """
+
+    def __init__(self, path, compressor, queue_size=QUEUE_SIZE):
+        self.path = path
+        self.compressor = compressor
+        self.queue = Queue.Queue(queue_size)
+        self.error = None
+        self.raw = open_file(path, "wb")
+
+        self.thread = threading.Thread(target=self.run, name="compressor")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+
+            if self.error:
+                # drain queue, so writer is never blocked
+                continue
+
+            try:
+                self.raw.write(self.compressor.compress(data))
+
+            except Exception as error:
+                self.error = error
+
+        if not self.error:
+            try:
+                self.raw.write(self.compressor.flush())
+
+            except Exception as error:
+                self.error = error
+
+    def check(self):
+        if self.error:
+            CRITICAL("Can't write compressed file '%s': %s", self.path, self.error)
+            emergency_exit()
+
+    def write(self, data):
+        self.check()
+        if data:
+            self.queue.put(data)
+
+    def writelines(self, lines):
+        self.write("".join(lines))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.raw.close()
+        self.check()
+
+        DEBUG("Compressed file written: %s", self.path)
+
+
+def open_output(path, level=None):
+    """Open file @path for writing. Files with .gz and .zst
+        extensions are compressed on the fly
+    """
+    compressor = compressor_for(path, level)
+    if compressor is None:
+        return open_file(path, "wb")
+
+    return CompressedFile(path, compressor)
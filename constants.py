@@ -22,6 +22,9 @@ RESOURCES_FILE = "__resources__.json"
 STRUCT_FILE = "__struct__.json"
 USERS_GROUPS_FILE = "__users_groups__.json"
 
+MANIFEST_FILE = "__manifest__.json"
+MAKE_STATE_FILE = "__make__.json"
+
 BASE_FOLDERS = (
     DATABASES_FOLDER,
     LIBRARIES_FOLDER,
@@ -48,6 +51,8 @@ RESERVED_NAMES = (
     SVN_FOLDER,
     GIT_FOLDER,
     LIBRARIES_FILE,
+    MANIFEST_FILE,
+    MAKE_STATE_FILE,
     OS_X_FOLDER
 )
 
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import io
+import os
+import subprocess
+import threading
+
+from helpers import DEBUG, INFO, CRITICAL, EXCEPTION, emergency_exit, \
+    FolderEntry
+
+
+def run_git(repo, *args):
+    """Run git command in @repo and return its output
+    """
+    try:
+        return subprocess.check_output(("git", "-C", repo) + args)
+
+    except (OSError, subprocess.CalledProcessError):
+        CRITICAL("git %s failed in '%s'", " ".join(args), repo)
+        EXCEPTION("")
+        emergency_exit()
+
+
+def has_revision(repo, revision):
+    """Check if @revision exists in @repo
+    """
+    with open(os.devnull, "wb") as devnull:
+        return subprocess.call(
+            ("git", "-C", repo, "rev-parse", "--verify", "--quiet",
+             "{}^{{commit}}".format(revision)),
+            stdout=devnull, stderr=devnull
+        ) == 0
+
+
+class FastImportStream(object):
+    """Stream files into git object database
+        through 'git fast-import' and commit them
+        as a whole tree
+    """
+
+    def __init__(self, repo, branch="refs/heads/master", message=""):
+        self.repo = repo
+        self.branch = branch if branch.startswith("refs/") \
+            else "refs/heads/{}".format(branch)
+        self.message = message or "Unpack application"
+        self.files = {}
+        self.marks = 0
+        self.ident = run_git(repo, "var", "GIT_COMMITTER_IDENT").strip()
+
+        DEBUG("Starting git fast-import in '%s'", repo)
+
+        try:
+            self.process = subprocess.Popen(
+                ("git", "-C", repo, "fast-import", "--quiet"),
+                stdin=subprocess.PIPE
+            )
+
+        except OSError:
+            CRITICAL("Can't start git fast-import in '%s'", repo)
+            EXCEPTION("")
+            emergency_exit()
+
+        self.stream = self.process.stdin
+
+    def write_file(self, path, data):
+        """Send blob to fast-import and remember its mark for @path
+        """
+        if isinstance(path, unicode):
+            path = path.encode("utf-8")
+
+        self.marks += 1
+        self.files[path] = self.marks
+
+        self.stream.write("blob\nmark :{}\ndata {}\n".format(self.marks, len(data)))
+        self.stream.write(data)
+        self.stream.write("\n")
+
+    def commit(self):
+        """Commit all written files replacing previous tree of branch
+        """
+        message = self.message.encode("utf-8") \
+            if isinstance(self.message, unicode) else self.message
+
+        self.stream.write("commit {}\n".format(self.branch))
+        self.stream.write("committer {}\n".format(self.ident))
+        self.stream.write("data {}\n{}\n".format(len(message), message))
+
+        if has_revision(self.repo, self.branch):
+            self.stream.write("from {}^0\n".format(self.branch))
+
+        self.stream.write("deleteall\n")
+        for path in sorted(self.files):
+            self.stream.write('M 100644 :{} "{}"\n'.format(
+                self.files[path],
+                path.replace("\\", "\\\\").replace('"', '\\"')
+            ))
+
+        self.stream.write("\n")
+        self.close()
+
+        INFO("Committed %s files to %s", len(self.files), self.branch)
+
+    def close(self):
+        self.stream.close()
+        if self.process.wait() != 0:
+            CRITICAL("git fast-import failed in '%s'", self.repo)
+            emergency_exit()
+
+
+class GitTree(object):
+    """Read-only view of git revision with the same interface
+        as file system source in build.py. Directory listings
+        are kept in memory, file contents are read through
+        single long-lived 'git cat-file --batch' process
+    """
+
+    def __init__(self, repo, revision):
+        self.repo = repo
+        self.revision = revision
+        self.blobs = {}
+        self.folders = {"": set()}
+
+        DEBUG("Reading tree of %s in '%s'", revision, repo)
+
+        listing = run_git(repo, "ls-tree", "-r", "-t", "-z", revision)
+        for entry in listing.split("\0"):
+            if not entry:
+                continue
+
+            info, path = entry.split("\t", 1)
+            mode, kind, sha = info.split(" ")
+            parent, _, name = path.rpartition("/")
+
+            self.folders.setdefault(parent, set()).add(name)
+            if kind == "tree":
+                self.folders.setdefault(path, set())
+
+            elif kind == "blob":
+                self.blobs[path] = sha
+
+        INFO("Git revision %s: %s files", revision, len(self.blobs))
+
+        self.reopen()
+
+    def reopen(self):
+        """Start own 'git cat-file' process,
+            e.g. in forked child process
+        """
+        self.lock = threading.Lock()
+        self.process = subprocess.Popen(
+            ("git", "-C", self.repo, "cat-file", "--batch"),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE
+        )
+
+    @staticmethod
+    def normalize(path):
+        return "/".join(
+            part for part in path.replace(os.sep, "/").split("/")
+            if part and part != "."
+        )
+
+    def location(self, path):
+        return "git:{}:{}".format(os.path.abspath(self.repo), self.normalize(path))
+
+    def signature(self, path):
+        """Blob SHA1 identifies file content
+        """
+        return self.blobs[self.normalize(path)]
+
+    digest = signature
+
+    def exists(self, path):
+        path = self.normalize(path)
+        return path in self.blobs or path in self.folders
+
+    def isdir(self, path):
+        return self.normalize(path) in self.folders
+
+    def isfile(self, path):
+        return self.normalize(path) in self.blobs
+
+    def listdir(self, path):
+        path = self.normalize(path)
+        if path not in self.folders:
+            raise OSError(2, "No such directory", path)
+
+        return sorted(self.folders[path])
+
+    def scan(self, path):
+        """Return {name: entry} for folder @path
+        """
+        path = self.normalize(path)
+        if path not in self.folders:
+            raise OSError(2, "No such directory", path)
+
+        prefix = path + "/" if path else ""
+        return {
+            name: FolderEntry(path, name, prefix + name in self.folders)
+            for name in self.folders[path]
+        }
+
+    def read(self, path):
+        """Return content of file @path
+        """
+        sha = self.blobs[self.normalize(path)]
+
+        with self.lock:
+            self.process.stdin.write(sha + "\n")
+            self.process.stdin.flush()
+
+            header = self.process.stdout.readline().split()
+            data = self.process.stdout.read(int(header[2]))
+            self.process.stdout.read(1)
+
+        return data
+
+    def open(self, path, mode="rb"):
+        """Open file @path from revision
+        """
+        try:
+            return io.BytesIO(self.read(path))
+
+        except Exception:
+            CRITICAL("Can't open file '%s' in %s", path, self.revision)
+            EXCEPTION("")
+            emergency_exit()
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import os
+import re
+import shutil
+
+from helpers import uuid
+
+
+# GUID in dash or underscore form, captured for re.split
+RE_GUID = re.compile(
+    "([0-9a-fA-F]{8}[-_][0-9a-fA-F]{4}[-_][0-9a-fA-F]{4}[-_][0-9a-fA-F]{4}[-_][0-9a-fA-F]{12})"
+)
+# Also finds GUIDs overlapping other matches, for search
+RE_ANY_GUID = re.compile("(?={})".format(RE_GUID.pattern))
+GUID_LENGTH = 36
+
+# Bytes read at once from replaced file
+BLOCK_SIZE = 1 << 20
+
+
+class HashedStream(object):
+    """Write to @stream updating @sha with written data
+    """
+
+    def __init__(self, stream, sha):
+        self.stream = stream
+        self.sha = sha
+
+    def writelines(self, parts):
+        for part in parts:
+            self.sha.update(part)
+
+        self.stream.writelines(parts)
+
+
+class GUIDReplacer(object):
+    """Replace GUIDs from keys of @mapping (dash and underscore
+        forms) in one pass. Data is split by single GUID regexp
+        and found GUIDs are looked up with map(dict.get), so
+        there is no Python callback per match
+    """
+
+    def __init__(self, mapping, block_size=BLOCK_SIZE):
+        self.mapping = dict(
+            (key, value) for key, value in mapping.iteritems() if key != value
+        )
+        self.keys = frozenset(self.mapping)
+        self.block_size = block_size
+
+    def substitute(self, parts):
+        """Replace GUIDs in list @parts returned by RE_GUID.split.
+            Return True if any GUID is replaced
+        """
+        guids = parts[1::2]
+        if not guids:
+            return False
+
+        new_guids = map(self.mapping.get, guids, guids)
+        if new_guids == guids:
+            return False
+
+        parts[1::2] = new_guids
+        return True
+
+    def replace(self, data):
+        """Return @data with replaced GUIDs
+        """
+        parts = RE_GUID.split(data)
+        return "".join(parts) if self.substitute(parts) else data
+
+    def search_file(self, path):
+        """Check if file @path contains any GUID to replace
+        """
+        if not self.keys:
+            return False
+
+        tail = ""
+        with open(path, "rb") as hdlr:
+            while True:
+                block = hdlr.read(self.block_size)
+                if not block:
+                    return False
+
+                data = tail + block
+                if not self.keys.isdisjoint(RE_ANY_GUID.findall(data)):
+                    return True
+
+                # GUID can be split between blocks
+                tail = data[-(GUID_LENGTH - 1):]
+
+    def replace_stream(self, src, dst):
+        """Copy file object @src to @dst replacing GUIDs.
+            Return True if any GUID is replaced
+        """
+        changed = False
+        carry = ""
+        while True:
+            block = src.read(self.block_size)
+            parts = RE_GUID.split(carry + block)
+
+            if block:
+                # GUID can start in last bytes and end in next block
+                last = parts[-1]
+                cut = max(len(last) - (GUID_LENGTH - 1), 0)
+                parts[-1], carry = last[:cut], last[cut:]
+
+            if self.substitute(parts):
+                changed = True
+
+            dst.writelines(parts)
+
+            if not block:
+                return changed
+
+    def replace_file(self, path, sha=None):
+        """Replace GUIDs in file @path. Changed content is written
+            to new file which then replaces @path, so hard links
+            to old content are left untouched. New content is
+            hashed with @sha if it's set. Return True
+            if file is changed
+        """
+        if not self.search_file(path):
+            return False
+
+        tmp_path = "{}.replace-{}".format(path, uuid())
+        try:
+            with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+                changed = self.replace_stream(src, HashedStream(dst, sha) if sha else dst)
+
+            if changed:
+                shutil.copymode(path, tmp_path)
+                os.rename(tmp_path, path)
+
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return changed
@@ -1,12 +1,17 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
+import atexit
+import errno
+import functools
+import hashlib
 import json
 import logging
 import os
 import re
 import shutil
 import sys
+import threading
 
 from uuid import uuid4
 
@@ -14,10 +19,24 @@ from logging import debug as DEBUG, \
     info as INFO, \
     critical as CRITICAL, \
     error as ERROR, \
+    warning as WARNING, \
     exception as EXCEPTION
 
 import constants
 
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 
 ####### LOGGING HELPERS #######
 # We use root level logger (it is easy)
@@ -42,6 +61,7 @@ BLOCK_END = "+"*70
 def print_block_end(func):
     """Prints 70 '+' chars after function call
     """
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         """Call function and print line
         """
@@ -130,19 +150,120 @@ def build_path(*args):
     return os.path.join(*args)
 
 
-def erase_dir(path):
+# Data about application trees which must not get into them
+USER_CACHE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "vdom2fs"
+)
+
+
+def tree_cache_path(kind, root, ext):
+    """Return path of @kind cache file of folder @root
+        in user cache folder
+    """
+    key = hashlib.sha1(os.path.realpath(root)).hexdigest()
+    return os.path.join(USER_CACHE, kind, key + ext)
+
+
+# Threads removing erased folders in background
+ERASE_THREADS = []
+
+
+def wait_background_erase():
+    """Wait until all background erase threads are done
+    """
+    while ERASE_THREADS:
+        thread = ERASE_THREADS.pop()
+        DEBUG("Waiting for background erase: %s", thread.name)
+        thread.join()
+
+
+atexit.register(wait_background_erase)
+
+
+def stale_trash(path):
+    """Return trash folders of @path left by erase_dir()
+        of killed processes, ones being removed now are skipped
+    """
+    folder, name = os.path.split(os.path.abspath(path))
+    prefix = ".{}.erased-".format(name)
+    active = set(thread.name for thread in ERASE_THREADS)
+
+    try:
+        nodes = os.listdir(folder)
+
+    except OSError:
+        return []
+
+    return [
+        os.path.join(folder, node) for node in nodes
+        if node.startswith(prefix) and os.path.join(folder, node) not in active
+    ]
+
+
+def remove_trash(paths):
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def erase_dir(path, background=False):
     """Remove all folders and files in dir @path
        except folder from @constants.DO_NOT_DELETE
+    - @background - move content aside to trash folder
+      and remove it in separate thread. Trash folders
+      left by killed runs are removed with it
     """
     DEBUG("Erasing '%s'", path)
 
+    trash = None
+    stale = []
+    if background:
+        stale = stale_trash(path)
+        for stale_path in stale:
+            DEBUG("Removing stale '%s'", stale_path)
+
+        abs_path = os.path.abspath(path)
+        trash = os.path.join(
+            os.path.dirname(abs_path),
+            ".{}.erased-{}".format(os.path.basename(abs_path), uuid())
+        )
+        try:
+            os.mkdir(trash)
+
+        except OSError:
+            DEBUG("Can't create '%s', erasing in foreground", trash)
+            trash = None
+
     for node in os.listdir(path):
         if node in constants.DO_NOT_DELETE:
             continue
 
         node_path = os.path.join(path, node)
+
+        if trash:
+            try:
+                os.rename(node_path, os.path.join(trash, node))
+                continue
+
+            except OSError:
+                DEBUG("Can't move '%s' aside, removing it now", node_path)
+
         (shutil.rmtree if os.path.isdir(node_path) else os.remove)(node_path)
 
+    if trash:
+        thread = threading.Thread(
+            target=remove_trash,
+            args=([trash] + stale,),
+            name=trash
+        )
+        thread.start()
+        ERASE_THREADS.append(thread)
+
+        DEBUG("'%s' is being removed in background", trash)
+
+    else:
+        remove_trash(stale)
+
     DEBUG("'%s' successfully erased", path)
 
 
@@ -190,7 +311,7 @@ def create_folder(path, erase=False, quiet=False):
     ERROR("Can't create '%s' folder", path)
     if erase:
         try:
-            erase_dir(path)
+            erase_dir(path, background=True)
 
         except Exception:
             CRITICAL("Folder '%s' can't be erased")
@@ -234,6 +355,36 @@ def read_file(path):
         emergency_exit()
 
 
+class FolderEntry(object):
+    """Minimal os.DirEntry replacement. If type of entry
+        is unknown it is checked on first is_dir() call
+    """
+
+    __slots__ = ("name", "path", "_is_dir")
+
+    def __init__(self, folder, name, is_dir=None):
+        self.name = name
+        self.path = os.path.join(folder, name)
+        self._is_dir = is_dir
+
+    def is_dir(self):
+        if self._is_dir is None:
+            self._is_dir = os.path.isdir(self.path)
+
+        return self._is_dir
+
+
+def scan_folder(path):
+    """Return {name: entry} for folder @path. Entries of scandir
+        carry type info read with listing, so checking it costs
+        no extra system calls
+    """
+    if scandir:
+        return {entry.name: entry for entry in scandir(path)}
+
+    return {name: FolderEntry(path, name) for name in os.listdir(path)}
+
+
 def open_file(path, mode="rb"):
     """Open file
     """
@@ -246,20 +397,155 @@ def open_file(path, mode="rb"):
         emergency_exit()
 
 
-####### DATA HELPERS #######
+# ioctl request cloning file extents (Linux, Btrfs/XFS/...)
+FICLONE = 0x40049409
 
-def clean_data(data, strip=True):
-    if len(set(data) - set(["\n", "\t"])) > 0:
-        return data.strip("\n\t\r") if strip else data
+# Errors meaning that reflink or hard link isn't supported
+LINK_ERRORS = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EXDEV,
+               errno.EPERM, errno.EMLINK, errno.ENOSYS)
+
+# Pairs of devices (source, target) without reflink support
+NO_REFLINK = set()
+
+
+def reflink_file(src, dst):
+    """Clone file @src to @dst sharing data blocks.
+        Return False if filesystem can't do it
+    """
+    if fcntl is None:
+        return False
+
+    devices = (os.stat(src).st_dev, os.stat(os.path.dirname(dst) or ".").st_dev)
+    if devices in NO_REFLINK:
+        return False
+
+    with open(src, "rb") as src_hdlr, open(dst, "wb") as dst_hdlr:
+        try:
+            fcntl.ioctl(dst_hdlr.fileno(), FICLONE, src_hdlr.fileno())
+
+        except IOError as error:
+            if error.errno not in LINK_ERRORS:
+                raise
+
+            NO_REFLINK.add(devices)
+            cloned = False
+
+        else:
+            cloned = True
+
+    if not cloned:
+        os.remove(dst)
+        return False
+
+    shutil.copystat(src, dst)
+    return True
+
+
+def link_file(src, dst):
+    """Make @dst share content with @src without copying:
+        reflink if filesystem supports it, hard link otherwise.
+        Falls back to copy. Return used method name
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    if reflink_file(src, dst):
+        return "reflink"
+
+    try:
+        os.link(src, dst)
+
+    except OSError as error:
+        if error.errno not in LINK_ERRORS:
+            raise
 
     else:
+        return "link"
+
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def unshare_file(path):
+    """Break hard link @path into private copy, so it
+        can be changed without touching other links.
+        Reflinked files are copy-on-write already
+    """
+    if os.stat(path).st_nlink < 2:
+        return False
+
+    DEBUG("Break link '%s'", path)
+
+    tmp_path = "{}.unshare-{}".format(path, uuid())
+    shutil.copy2(path, tmp_path)
+    os.rename(tmp_path, path)
+    return True
+
+
+####### DATA HELPERS #######
+
+# Any char except new line and tab
+RE_NOT_NL_TAB = re.compile(r"[^\n\t]")
+# Data with these chars is wrapped to CDATA section
+CDATA_CHARS = ("\n", "<", ">", "&", '"', "'")
+
+CDATA_START = "<![CDATA["
+CDATA_END = "]]>"
+CDATA_END_ESCAPED = "]]]]><![CDATA[>"
+
+
+def clean_data(data, strip=True):
+    """Return "" if data has only new lines and tabs,
+        else data without leading and trailing new lines
+    """
+    if RE_NOT_NL_TAB.search(data) is None:
         return ""
 
+    return data.strip("\n\t\r") if strip else data
+
 
 def encode(data, encoding="utf-8"):
+    """Encode unicode, byte strings are returned as is
+    """
+    if isinstance(data, str):
+        return data
+
     return data.encode(encoding)
 
 
+def normalize_text(data, strip=True, encoding="utf-8"):
+    """Clean and encode text (attribute values, information fields)
+    """
+    return encode(clean_data(data, strip), encoding)
+
+
+def needs_cdata(data, force=False):
+    """Check if @data must be wrapped to CDATA section.
+        Whitespace-only data is never wrapped unless @force
+    """
+    if force:
+        return True
+
+    # same as "not data.strip()", but without copying
+    if not data or data.isspace():
+        return False
+
+    for char in CDATA_CHARS:
+        if char in data:
+            return True
+
+    return False
+
+
+def cdata(data, force=False):
+    """Return @data wrapped to CDATA section if necessary
+    """
+    if not needs_cdata(data, force):
+        return data
+
+    return CDATA_START + data.replace(CDATA_END, CDATA_END_ESCAPED) + CDATA_END
+
+
 def decode(data, encoding="utf-8"):
     return data.decode(encoding)
 
@@ -3,20 +3,26 @@
 
 
 import argparse
+import copy
+import hashlib
+import json
 import logging
+import multiprocessing
 import os
 import re
-import shutil
 
 # from functools import partial
-from uuid import UUID
+from uuid import UUID, uuid5
 
 import constants
 from helpers import setup_logging, DEBUG, INFO, ERROR, \
     check_python_version, script_exit, \
     create_folder, uuid as gen_guid, json_load, \
-    open_file as fopen, json_dump, \
-    convert_to_regexp, check_by_regexps
+    open_file as fopen, json_dump, encode, \
+    convert_to_regexp, check_by_regexps, \
+    link_file, unshare_file
+from manifest import write_manifest, hash_file, copy_file
+from guid_replacer import GUIDReplacer
 
 
 RE_RES_UUID = re.compile("[0-F]{8}-[0-F]{4}-[0-F]{4}-[0-F]{4}-[0-F]{12}", re.I)
@@ -24,64 +30,192 @@ RE_OBJ_UUID = re.compile("[0-F]{8}[-_][0-F]{4}[-_][0-F]{4}[-_][0-F]{4}[-_][0-F]{
 
 
 GUIDS_TO_REPLACE = {}
+# GUIDReplacer for GUIDS_TO_REPLACE
+REPLACER = None
+
+# Link files to sources instead of copying (--link)
+LINK_FILES = False
+
+# Number of processes replacing GUIDs (--jobs)
+JOBS = 1
+
+# Update target of previous run (--incremental)
+INCREMENTAL = False
+# State of previous run loaded from MAKE_STATE_FILE
+PREVIOUS = {}
+# Target files of this run: {relative path: source info}
+PLACED = {}
+# Target files written by this run (relative paths)
+WRITTEN = set()
+# GUIDs generated by this run: {key: GUID}
+GENERATED = {}
+# Hashes of target files known from writing them: {relative path: SHA1}
+TARGET_HASHES = {}
+# Hash of config, see config_digest()
+CONFIG_DIGEST = None
+# Target described without copying, see plan()
+PLAN = None
+# Namespace of GUIDs generated by plan()
+PLAN_NAMESPACE = UUID("0c6f3f7e-8d52-4b8a-a3c4-6e1d9b2f7a15")
+
+
+class FullRebuild(Exception):
+    """Target of previous run can't be updated incrementally
+    """
+
+
+def stable_guid(key):
+    """Generate GUID for @key. Incremental run reuses
+        GUID generated for the same @key by previous run,
+        plan() derives it from config and @key
+    """
+    if PLAN is not None:
+        return str(uuid5(PLAN_NAMESPACE, "{}:{}".format(CONFIG_DIGEST, encode(key))))
+
+    GENERATED[key] = guid = PREVIOUS.get("generated", {}).get(key) or gen_guid()
+    return guid
+
+
+def config_digest(config):
+    """Return hash of config file content
+    """
+    data = dict((key, value) for key, value in config.iteritems() if key != "target")
+    return hashlib.sha1(json.dumps(data, sort_keys=True)).hexdigest()
+
+
+def file_signature(path):
+    """Return [size, mtime] of file @path or None if it doesn't exist
+    """
+    try:
+        stat = os.stat(path)
+
+    except OSError:
+        return None
+
+    return [stat.st_size, stat.st_mtime]
+
+
+def str_values(data):
+    """Convert unicode strings of loaded JSON @data to UTF-8 str,
+        so paths and GUIDs can be mixed with ones made by this run
+    """
+    if isinstance(data, unicode):
+        return data.encode("utf8")
+
+    if isinstance(data, dict):
+        return dict((str_values(key), str_values(value)) for key, value in data.iteritems())
+
+    if isinstance(data, list):
+        return [str_values(value) for value in data]
 
+    return data
 
-def re_res_sub(resources):
-    """Regexp sub pattern function
+
+def load_make_state(config):
+    """Load state of previous run from target folder.
+        Return False if target must be made from scratch
     """
+    path = os.path.join(config["target"]["path"], constants.MAKE_STATE_FILE)
+    if not os.path.exists(path):
+        INFO("No state of previous run, making target from scratch")
+        return False
 
-    def func(match, *args, **kwargs):
-        """Processing match objects. Replacing resources GUIDs.
-        """
+    with fopen(path, "rb") as hdlr:
+        state = json_load(hdlr)
 
-        data = match.group(0)
-        return (resources[data], True) if data in resources else (data, False)
+    if not state or state.get("config") != CONFIG_DIGEST:
+        INFO("Config is changed, making target from scratch")
+        # target belongs to previous incremental run
+        config["target"]["erase"] = True
+        return False
 
-    return func
+    PREVIOUS.update(str_values(state))
+    return True
 
 
-def re_obj_sub(objects):
-    """Regexp sub pattern function
+def place_file(source_path, target_path, config):
+    """Copy (or link) file @source_path to @target_path.
+        Incremental run keeps file made by previous run
+        if neither source nor target is changed since then.
+        Return True if file is written
     """
+    rel_path = os.path.relpath(target_path, config["target"]["path"])
+    if PLAN is not None:
+        PLAN["files"][rel_path] = os.path.abspath(source_path)
+        return True
+
+    stat = os.stat(source_path)
+    entry = PLACED[rel_path] = {
+        "source": os.path.abspath(source_path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime
+    }
+
+    old = PREVIOUS.get("files", {}).get(rel_path)
+    if old and old["source"] == entry["source"] and \
+            old["target"] == file_signature(target_path):
 
-    def func(match, create_new=False, *args, **kwargs):
-        """Processing match objects. Replacing objects GUIDs.
-        """
+        if [old["size"], old["mtime"]] == [stat.st_size, stat.st_mtime] or \
+                old["size"] == stat.st_size and old["hash"] == hash_file(source_path):
 
-        data = match.group(0)
+            DEBUG("Keep '%s'", target_path)
+            entry["hash"] = old["hash"]
+            return False
 
-        if create_new:
-            dash = data.replace("_", "-") if "_" in data else data
+    # target can be linked to old source content
+    if os.path.lexists(target_path):
+        os.remove(target_path)
 
-            if dash not in objects:
-                new = gen_guid()
-                objects[dash] = new
-                objects[dash.replace("-", "_")] = new.replace("-", "_")
+    if LINK_FILES:
+        DEBUG("Link '%s' to '%s': %s", source_path, target_path,
+              link_file(source_path, target_path))
 
-        if data in objects:
-            return (objects[data], True)
+        if INCREMENTAL:
+            entry["hash"] = hash_file(source_path)
+
+    else:
+        DEBUG("Copy '%s' to '%s'", source_path, target_path)
+        entry["hash"] = copy_file(source_path, target_path)
 
-        return (data, False)
+    if "hash" in entry:
+        TARGET_HASHES[rel_path] = entry["hash"]
+
+    WRITTEN.add(rel_path)
+    return True
+
+
+def place_tree(source_path, target_path, config):
+    """Place all files of folder @source_path
+        to @target_path with place_file()
+    """
+    for cwd, dirs, files in os.walk(source_path):
+        target = os.path.join(target_path, os.path.relpath(cwd, source_path))
+        if PLAN is None and not os.path.isdir(target):
+            os.makedirs(target)
 
-    return func
+        for name in files:
+            place_file(os.path.join(cwd, name), os.path.join(target, name), config)
 
 
-def sub_chain_func(chain):
-    """Regexp sub pattern function
+def write_json(path, data, config):
+    """Write JSON @data to target file @path,
+        plan() keeps it in memory
     """
+    rel_path = os.path.relpath(path, config["target"]["path"])
+    data = json_dump(data, critical=True)
 
-    def func(match, *args, **kwargs):
-        """Processing match objects
-        """
+    if PLAN is not None:
+        PLAN["contents"][rel_path] = data
+        return
 
-        for sub_func in chain:
-            result = sub_func(match, *args, **kwargs)
-            if result[1]:
-                return result[0]
+    # file can be linked to source, so make own copy first
+    if os.path.exists(path):
+        unshare_file(path)
 
-        return match.group(0)
+    with fopen(path, "wb") as hdlr:
+        hdlr.write(data)
 
-    return func
+    TARGET_HASHES[rel_path] = hashlib.sha1(data).hexdigest()
 
 
 def normalize_path(path, config):
@@ -108,6 +242,15 @@ def create_basic_structure(config):
 
     DEBUG("Creating basic structure")
 
+    if INCREMENTAL and load_make_state(config):
+        root = config["target"]["path"]
+        for folder in constants.BASE_FOLDERS:
+            if not os.path.isdir(os.path.join(root, folder)):
+                create_folder(os.path.join(root, folder))
+
+        INFO("Target of previous run is updated: %s", root)
+        return
+
     root = config["target"]["path"] = create_folder(**config["target"])
 
     for folder in constants.BASE_FOLDERS:
@@ -116,8 +259,9 @@ def create_basic_structure(config):
     INFO("Basic structure successfully created")
 
 
-def copy_files(target, sources, config):
-    """Copy files
+def copy_files(target, sources, config, rename=None):
+    """Copy files. Name of copied file is changed
+        to @rename(name, source path) if it's set
     """
 
     if not isinstance(sources, (list, tuple)):
@@ -193,11 +337,11 @@ def copy_files(target, sources, config):
             else:
                 new_name = name
 
-            target_path = os.path.join(target, new_name)
-
             if os.path.exists(source_path):
-                DEBUG("Copy '%s' to '%s'", source_path, target_path)
-                shutil.copy2(source_path, target_path)
+                if rename:
+                    new_name = rename(new_name, source_path)
+
+                place_file(source_path, os.path.join(target, new_name), config)
                 copied_files.append(new_name)
 
             else:
@@ -206,6 +350,28 @@ def copy_files(target, sources, config):
     return copied_files
 
 
+def new_resource_name(old_name, source_path):
+    """Generate new GUID of resource and return new file name
+    """
+    raw_name = old_name.split("_", 2)
+    res_guid = res_name = res_type = ""
+
+    try:
+        res_guid = str(UUID(raw_name[0])).lower()
+
+    except ValueError:
+        res_guid = stable_guid("resource id:" + source_path)
+        res_name = old_name.rsplit(".", 1)
+        res_name, res_type = res_name if len(res_name) == 2 else (res_name[0], "res")
+
+    else:
+        res_type = raw_name[1]
+        res_name = raw_name[2]
+
+    new_guid = GUIDS_TO_REPLACE[res_guid] = stable_guid("resource:" + source_path)
+    return "{}_{}_{}".format(new_guid, res_type, res_name)
+
+
 def copy_resources(config):
     """Copy resources
     """
@@ -227,40 +393,12 @@ def copy_resources(config):
 
     for source in sources:
 
-        files = copy_files(target_path, source, config)
-
         change_guids = False
         if isinstance(source, dict):
             change_guids = bool(source.get("generateGUIDs", False))
 
-        if not change_guids:
-            continue
-
-        for old_name in files:
-
-            raw_name = old_name.split("_", 2)
-            res_guid = res_name = res_type = ""
-
-            try:
-                res_guid = str(UUID(raw_name[0])).lower()   
-
-            except ValueError:
-                res_guid = gen_guid()
-                res_name = old_name.rsplit(".", 1)
-                res_name, res_type = res_name if len(res_name) == 2 else (res_name[0], "res")
-
-            else:
-                res_type = raw_name[1]
-                res_name = raw_name[2]
-
-            new_guid = GUIDS_TO_REPLACE[res_guid] = gen_guid()
-            new_name = "{}_{}_{}".format(new_guid, res_type, res_name)
-
-            old_path = os.path.join(target_path, old_name)
-            new_path = os.path.join(target_path, new_name)
-
-            DEBUG("Move '%s' to '%s'", old_path, new_path)
-            shutil.move(old_path, new_path)
+        copy_files(target_path, source, config,
+                   rename=new_resource_name if change_guids else None)
 
     INFO("Resources were copied successfully")
 
@@ -325,6 +463,27 @@ def copy_app_actions(config):
     INFO("Application actions were copied successfully")
 
 
+def new_database_name(old_name, source_path):
+    """Generate new GUID of database and return new file name
+    """
+    raw_name = old_name.split("_", 1)
+    res_type = "sqlite"
+    res_guid = res_name = ""
+
+    try:
+        res_guid = str(UUID(raw_name[0])).lower()
+
+    except ValueError:
+        res_guid = stable_guid("database id:" + source_path)
+        res_name = old_name.rsplit(".", 1)[0]
+
+    else:
+        res_name = raw_name[1].rsplit(".", 1)[0]
+
+    new_guid = GUIDS_TO_REPLACE[res_guid] = stable_guid("database:" + source_path)
+    return "{}_{}.{}".format(new_guid, res_name, res_type)
+
+
 def copy_databases(config):
     """Copy databases
     """
@@ -346,39 +505,12 @@ def copy_databases(config):
 
     for source in sources:
 
-        files = copy_files(target_path, source, config)
-
         change_guids = False
         if isinstance(source, dict):
             change_guids = bool(source.get("generateGUIDs", False))
 
-        if not change_guids:
-            continue
-
-        for old_name in files:
-
-            raw_name = old_name.split("_", 1)
-            res_type = "sqlite"
-            res_guid = res_name = ""
-
-            try:
-                res_guid = str(UUID(raw_name[0])).lower()
-
-            except ValueError:
-                res_guid = gen_guid()
-                res_name = old_name.rsplit(".", 1)[0]
-
-            else:
-                res_name = raw_name[1].rsplit(".", 1)[0]
-
-            new_guid = GUIDS_TO_REPLACE[res_guid] = gen_guid()
-            new_name = "{}_{}.{}".format(new_guid, res_name, res_type)
-
-            old_path = os.path.join(target_path, old_name)
-            new_path = os.path.join(target_path, new_name)
-
-            DEBUG("Move '%s' to '%s'", old_path, new_path)
-            shutil.move(old_path, new_path)
+        copy_files(target_path, source, config,
+                   rename=new_database_name if change_guids else None)
 
     # copy_files(target_path, config["Databases"], config)
 
@@ -455,6 +587,7 @@ def copy_pages(config):
                 new_pages.append(new_page)
 
 
+    copied_pages = set()
     for page in new_pages:
 
         if isinstance(page, (str, unicode)):
@@ -474,32 +607,39 @@ def copy_pages(config):
             page["rename"] = False
 
         copy_path = os.path.join(target_path, page["name"])
-        if os.path.exists(copy_path):
+
+        # target can have folders of previous incremental run
+        if copy_path in copied_pages:
             ERROR("Directory already exists: '{}'".format(copy_path))
             continue
 
+        copied_pages.add(copy_path)
+
         if page.get("mode", "") not in ("move", "copy"):
             page["mode"] = "move"
 
         # copy page to new folder
         DEBUG("Copy '{}' to '{}'".format(page["path"], copy_path))
-        shutil.copytree(page["path"], copy_path)
+        place_tree(page["path"], copy_path, config)
 
+        # read source file: copy kept by incremental run has new GUIDs
         info_path = os.path.join(copy_path, constants.INFO_FILE)
-        with fopen(info_path, "rb") as hdlr:
+        with fopen(os.path.join(page["path"], constants.INFO_FILE), "rb") as hdlr:
             info = json_load(hdlr, critical=True)
 
         if page.get("rename", True):
             info["attrs"]["Name"] = page["name"]
 
-        with fopen(info_path, "wb") as hdlr:
-            json_dump(info, hdlr, critical=True)
+        if not INCREMENTAL or \
+                os.path.relpath(info_path, config["target"]["path"]) in WRITTEN:
+
+            write_json(info_path, info, config)
 
         # if page not copied continue, else need to change all guids to new
         if page["mode"] == "move":
             continue
 
-        new_guid = gen_guid()
+        new_guid = stable_guid("page:" + page["path"])
         old_guid = info["attrs"]["ID"]
 
         GUIDS_TO_REPLACE[old_guid] = new_guid
@@ -521,7 +661,7 @@ def create_application_info_file(config):
             info = json_load(hdlr)
 
     else:
-        info = dict(ID=gen_guid(), Name="Application", Description="",
+        info = dict(ID=stable_guid("application"), Name="Application", Description="",
                     Owner="-", Active="1", Serverversion="",
                     ScriptingLanguage="python", Icon="")
 
@@ -531,19 +671,69 @@ def create_application_info_file(config):
 
     # Generate new GUID if it isn't exiisting
     if not info.get("ID", ""):
-        info["ID"] = gen_guid()
+        info["ID"] = stable_guid("application")
 
     # Write data to file
     path = os.path.join(config["target"]["path"], constants.INFO_FILE)
+    PLACED[constants.INFO_FILE] = {"source": None}
+    WRITTEN.add(constants.INFO_FILE)
 
     DEBUG("Writing application info to '%s'", path)
 
-    with fopen(path, "wb") as hdlr:
-        json_dump(info, hdlr)
+    write_json(path, info, config)
 
     INFO("Application info successfully written to '%s'", path)
 
 
+def set_guids_to_replace(guids):
+    """Create replacer of @guids. Forked pool
+        workers inherit one compiled by parent
+    """
+    global REPLACER
+    if REPLACER is None or REPLACER.mapping != guids:
+        REPLACER = GUIDReplacer(guids)
+
+
+def replace_guids_in_file(path):
+    """Replace GUIDs in file @path. File is written
+        only if its content is changed. Return SHA1
+        of new content if so, None otherwise
+    """
+    sha = hashlib.sha1()
+    if not REPLACER.replace_file(path, sha):
+        return None
+
+    DEBUG(" - Replaced GUIDs in file %s", path)
+    return sha.hexdigest()
+
+
+def replace_guids(paths, guids):
+    """Replace @guids in files @paths (in JOBS processes).
+        Return {changed file: SHA1 of new content}
+    """
+    set_guids_to_replace(guids)
+
+    pool = multiprocessing.Pool(
+        JOBS, initializer=set_guids_to_replace, initargs=(guids,)
+    ) if JOBS > 1 and len(paths) > 1 else None
+
+    try:
+        digests = (pool.imap if pool else map)(replace_guids_in_file, paths)
+        return dict((path, digest) for path, digest in zip(paths, digests) if digest)
+
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+
+def update_hashes(digests, root):
+    """Remember hashes of files changed by GUIDs replacement
+    """
+    for path, digest in digests.iteritems():
+        TARGET_HASHES[os.path.relpath(path, root)] = digest
+
+
 def replace_all_guids(config):
     """
     Replace all guids in application
@@ -551,33 +741,114 @@ def replace_all_guids(config):
     INFO("Replace all GUIDs in application")
     INFO("GUIDs to replace - %s", len(GUIDS_TO_REPLACE))
 
-    if GUIDS_TO_REPLACE:
-        
-        regexp = RE_OBJ_UUID
-        
-        # function for guids replacement
-        sub_func = sub_chain_func([re_res_sub(GUIDS_TO_REPLACE)])
+    root = config["target"]["path"]
+
+    if INCREMENTAL and PREVIOUS:
+        for guid, new_guid in PREVIOUS["guids"].iteritems():
+            if GUIDS_TO_REPLACE.get(guid) != new_guid:
+                raise FullRebuild("GUID {} isn't replaced anymore".format(guid))
 
-        for cwd, dirs, files in os.walk(config["target"]["path"]):
+        # files kept from previous run have all GUIDs
+        # replaced except ones added by this run
+        written = sorted(os.path.join(root, rel_path) for rel_path in WRITTEN)
+        kept = sorted(
+            os.path.join(root, rel_path) for rel_path in PLACED
+            if rel_path not in WRITTEN
+        )
+        added = dict(
+            (guid, new_guid) for guid, new_guid in GUIDS_TO_REPLACE.iteritems()
+            if guid not in PREVIOUS["guids"]
+        )
 
-            if files:
-                DEBUG("Replace GUIDs in directory '%s'", cwd)
+        changed = replace_guids(written, GUIDS_TO_REPLACE) if GUIDS_TO_REPLACE else {}
+        update_hashes(changed, root)
 
-                for node in sorted(files):
+        INFO("GUIDs replaced in %s of %s written files", len(changed), len(written))
 
-                    node_path = os.path.join(cwd, node)
-                    DEBUG(" - Replace in file %s", node_path)
+        if added:
+            changed = replace_guids(kept, added)
+            update_hashes(changed, root)
+            INFO("New GUIDs replaced in %s of %s kept files", len(changed), len(kept))
 
-                    with open(node_path, "rb") as src:
-                        data = src.read()
+    elif GUIDS_TO_REPLACE:
 
-                    with open(node_path, "wb") as dst:
-                        dst.write(regexp.sub(sub_func, data))
+        paths = []
+        for cwd, dirs, files in os.walk(root):
+            paths.extend(os.path.join(cwd, node) for node in sorted(files))
+
+        changed = replace_guids(paths, GUIDS_TO_REPLACE)
+        update_hashes(changed, root)
+
+        INFO("GUIDs replaced in %s of %s files", len(changed), len(paths))
 
     INFO("GUIDs successfully replaced")
 
 
-def make(config):
+def remove_outdated_files(config):
+    """Remove files made by previous run which
+        have no sources anymore (incremental run)
+    """
+    if not INCREMENTAL or not PREVIOUS:
+        return
+
+    root = config["target"]["path"]
+    base_folders = set(os.path.join(root, folder) for folder in constants.BASE_FOLDERS)
+
+    removed = 0
+    for rel_path in sorted(set(PREVIOUS["files"]) - set(PLACED)):
+        path = os.path.join(root, rel_path)
+        if not os.path.lexists(path):
+            continue
+
+        DEBUG("Remove '%s'", path)
+        os.remove(path)
+        removed += 1
+
+        # remove folders left empty, e.g. of removed page
+        folder = os.path.dirname(path)
+        while folder != root and folder not in base_folders and not os.listdir(folder):
+            os.rmdir(folder)
+            folder = os.path.dirname(folder)
+
+    INFO("Outdated files removed: %s", removed)
+
+
+def save_make_state(config):
+    """Write state of this run to target folder,
+        so next incremental run can update target
+    """
+    if not INCREMENTAL:
+        return
+
+    root = config["target"]["path"]
+    for rel_path, entry in PLACED.iteritems():
+        entry["target"] = file_signature(os.path.join(root, rel_path))
+
+    state = {
+        "config": CONFIG_DIGEST,
+        "files": PLACED,
+        "guids": GUIDS_TO_REPLACE,
+        "generated": GENERATED
+    }
+
+    with fopen(os.path.join(root, constants.MAKE_STATE_FILE), "wb") as hdlr:
+        json_dump(state, hdlr, critical=True)
+
+    INFO("State of make written: %s files, %s GUIDs",
+         len(PLACED), len(GUIDS_TO_REPLACE))
+
+
+def create_manifest(config):
+    """Write __manifest__.json with hashes of target tree,
+        files written by this run aren't read again
+    """
+    write_manifest(config["target"]["path"], dict(
+        (rel_path.replace(os.sep, "/"), digest)
+        for rel_path, digest in TARGET_HASHES.iteritems()
+    ))
+
+
+def make_steps(config):
     """Call copy functions in cycle
     """
     # Create child folders
@@ -589,7 +860,10 @@ def make(config):
                  copy_app_actions,
                  copy_pages,
                  create_application_info_file,
-                 replace_all_guids):
+                 remove_outdated_files,
+                 replace_all_guids,
+                 save_make_state,
+                 create_manifest):
 
         INFO("")
         INFO("+"*70)
@@ -597,6 +871,68 @@ def make(config):
         func(config)
 
 
+def plan(config):
+    """Resolve @config without copying anything: return
+        {"files": {target path: source path},
+         "contents": {target path: generated data}}
+        and GUIDs to replace. Target paths are relative.
+        Generated GUIDs depend only on config and source
+        paths, so repeated plans of the same config match
+    """
+    global PLAN
+    global CONFIG_DIGEST
+    CONFIG_DIGEST = config_digest(config)
+    PLAN = {"files": {}, "contents": {}}
+    GUIDS_TO_REPLACE.clear()
+
+    config["target"] = {"path": os.curdir}
+
+    try:
+        for func in (copy_resources,
+                     copy_databases,
+                     copy_libraries,
+                     copy_security,
+                     copy_app_actions,
+                     copy_pages,
+                     create_application_info_file):
+
+            func(config)
+
+        return PLAN, dict(GUIDS_TO_REPLACE)
+
+    finally:
+        PLAN = None
+
+
+def make(config):
+    """Make target. Incremental run falls back to making
+        target from scratch if it can't update it
+    """
+    global CONFIG_DIGEST
+    CONFIG_DIGEST = config_digest(config)
+
+    # steps change config
+    source_config = copy.deepcopy(config)
+
+    try:
+        make_steps(config)
+
+    except FullRebuild as error:
+        INFO("%s, making target from scratch", error)
+
+        for state in (GUIDS_TO_REPLACE, PREVIOUS, PLACED, GENERATED, TARGET_HASHES):
+            state.clear()
+
+        WRITTEN.clear()
+
+        config.clear()
+        config.update(source_config)
+        config["target"]["erase"] = True
+
+        os.remove(os.path.join(config["target"]["path"], constants.MAKE_STATE_FILE))
+        make_steps(config)
+
+
 def main():
     """Main function
     """
@@ -618,8 +954,26 @@ def main():
     args_parser.add_argument("-q", "--quiet", action="store_true",
                              help="no user interaction")
 
+    args_parser.add_argument("-l", "--link", action="store_true",
+                             help="reflink or hard link source files instead of "
+                                  "copying, changed files get own copies")
+
+    args_parser.add_argument("-j", "--jobs", type=int, default=1,
+                             help="replace GUIDs in JOBS processes")
+
+    args_parser.add_argument("-i", "--incremental", action="store_true",
+                             help="update target made by previous incremental "
+                                  "run: sync only changed files")
+
     args = args_parser.parse_args()
 
+    global LINK_FILES
+    global JOBS
+    global INCREMENTAL
+    LINK_FILES = args.link
+    JOBS = args.jobs
+    INCREMENTAL = args.incremental
+
     # Setup logging system and show necessary messages
     setup_logging(logging.INFO if args.verbosity == 0 else logging.DEBUG,
                   module_name=True if args.verbosity > 1 else False)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+
+import constants
+from helpers import setup_logging, DEBUG, INFO, ERROR, \
+    check_python_version, script_exit, emergency_exit, \
+    json_load, json_dump, open_file, encode, tree_cache_path, uuid
+
+
+# Files which never get into manifest
+SKIP_NAMES = set(constants.DO_NOT_DELETE) | set([
+    constants.MANIFEST_FILE,
+    constants.MAKE_STATE_FILE,
+])
+
+
+# Read files by blocks of this size while hashing
+BLOCK_SIZE = 1 << 20
+
+
+def hash_file(path):
+    """Return SHA1 hex digest of file content
+    """
+    sha = hashlib.sha1()
+    with open_file(path) as hdlr:
+        for block in iter(lambda: hdlr.read(BLOCK_SIZE), ""):
+            sha.update(block)
+
+    return sha.hexdigest()
+
+
+def copy_file(src, dst):
+    """Copy file @src to @dst with its stat like shutil.copy2.
+        Return SHA1 hex digest of content, hashed while copied
+    """
+    sha = hashlib.sha1()
+    with open(src, "rb") as src_hdlr, open(dst, "wb") as dst_hdlr:
+        for block in iter(lambda: src_hdlr.read(BLOCK_SIZE), ""):
+            sha.update(block)
+            dst_hdlr.write(block)
+
+    shutil.copystat(src, dst)
+    return sha.hexdigest()
+
+
+def hash_folder(children):
+    """Return rolled-up hash of folder from list of (name, hash) pairs
+    """
+    sha = hashlib.sha1()
+    for name, digest in sorted(children):
+        sha.update("{} {}\n".format(digest, name))
+
+    return sha.hexdigest()
+
+
+def load_manifest(root):
+    """Load manifest of tree @root or return None
+    """
+    path = os.path.join(root, constants.MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+
+    with open_file(path) as hdlr:
+        return json_load(hdlr)
+
+
+def load_stats(root):
+    """Load {relative path: [size, mtime, hash]} of files
+        of @root hashed by previous run, it's kept in user
+        cache, so manifest has only hashes and doesn't
+        change when files are written again
+    """
+    path = tree_cache_path("manifest", root, ".json")
+    if not os.path.exists(path):
+        return {}
+
+    with open_file(path) as hdlr:
+        stats = json_load(hdlr, default={}) or {}
+
+    # paths of walked tree are str
+    return dict((encode(rel_path), entry) for rel_path, entry in stats.iteritems())
+
+
+def save_stats(root, stats):
+    """Keep file stats of @root in user cache for next run
+    """
+    path = tree_cache_path("manifest", root, ".json")
+    tmp_path = "{}.{}.tmp".format(path, uuid())
+
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        with open(tmp_path, "wb") as hdlr:
+            json_dump(stats, hdlr)
+
+        os.rename(tmp_path, path)
+
+    except (IOError, OSError):
+        DEBUG("Can't save file stats to %s", path)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def build_manifest(root, hashes=None, stats=None):
+    """Hash every file and folder in @root. @hashes are
+        {relative path: hash} of files just written by caller,
+        files with the same size and mtime as in @stats are
+        not read again. Return manifest and new stats
+    """
+    hashes = hashes or {}
+    old_stats = stats or {}
+    stats = {}
+    files = {}
+    folders = {}
+
+    def visit(path, rel_path):
+        children = []
+
+        for name in os.listdir(path):
+            if name in SKIP_NAMES:
+                continue
+
+            node_path = os.path.join(path, name)
+            node_rel = "/".join((rel_path, name)) if rel_path else name
+
+            if os.path.isdir(node_path):
+                children.append((name + "/", visit(node_path, node_rel)))
+                continue
+
+            stat = os.stat(node_path)
+            entry = old_stats.get(node_rel)
+
+            if node_rel in hashes:
+                digest = hashes[node_rel]
+
+            elif entry and entry[:2] == [stat.st_size, stat.st_mtime]:
+                digest = entry[2]
+
+            else:
+                DEBUG("Hashing %s", node_path)
+                digest = hash_file(node_path)
+
+            files[node_rel] = digest
+            stats[node_rel] = [stat.st_size, stat.st_mtime, digest]
+            children.append((name, digest))
+
+        folders[rel_path] = digest = hash_folder(children)
+        return digest
+
+    manifest = {
+        "root": visit(root, ""),
+        "folders": folders,
+        "files": files
+    }
+    return manifest, stats
+
+
+def write_manifest(root, hashes=None):
+    """Create or update __manifest__.json in @root.
+        @hashes are {relative path: hash} of files
+        which caller hashed while writing them
+    """
+    INFO("Writing manifest: %s", root)
+
+    manifest, stats = build_manifest(root, hashes, load_stats(root))
+    save_stats(root, stats)
+
+    with open_file(os.path.join(root, constants.MANIFEST_FILE), "wb") as hdlr:
+        json_dump(manifest, hdlr, critical=True)
+
+    INFO("Manifest written: %s files, root %s",
+         len(manifest["files"]), manifest["root"])
+
+    return manifest
+
+
+def diff_manifests(old, new):
+    """Return sorted list of changed files and folders.
+        Subtrees with equal hashes are skipped entirely
+    """
+    children = {}
+    for manifest in (old, new):
+        for key in manifest["files"].keys() + manifest["folders"].keys():
+            if key:
+                parent = key.rsplit("/", 1)[0] if "/" in key else ""
+                children.setdefault(parent, set()).add(key)
+
+    changed = []
+    stack = [""]
+
+    while stack:
+        path = stack.pop()
+
+        if path in old["folders"] or path in new["folders"]:
+            if old["folders"].get(path) == new["folders"].get(path):
+                continue
+
+            changed.append(path)
+            stack.extend(children.get(path, ()))
+
+        elif old["files"].get(path) != new["files"].get(path):
+            changed.append(path)
+
+    return sorted(changed)
+
+
+def main():
+    """Main function
+    """
+    args_parser = argparse.ArgumentParser()
+
+    args_parser.add_argument("source", type=str,
+                             help="application source folder")
+
+    args_parser.add_argument("-d", "--diff", type=argparse.FileType("rb"),
+                             help="print changes against other manifest")
+
+    args_parser.add_argument("-v", "--verbosity", action="count",
+                             help="be more verbose",
+                             default=0)
+
+    args = args_parser.parse_args()
+
+    # Setup logging system and show necessary messages
+    setup_logging(logging.INFO if args.verbosity == 0 else logging.DEBUG,
+                  module_name=True if args.verbosity > 1 else False)
+
+    if not os.path.isdir(args.source):
+        ERROR("Can't find %s", args.source)
+        emergency_exit()
+
+    previous = json_load(args.diff, critical=True) if args.diff \
+        else load_manifest(args.source)
+
+    manifest = write_manifest(args.source)
+
+    if previous:
+        for path in diff_manifests(previous, manifest):
+            print path or "."
+
+
+if __name__ == "__main__":
+    check_python_version()
+    main()
+    script_exit()
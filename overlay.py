@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import hashlib
+import io
+import os
+import tempfile
+
+import constants
+import make
+from helpers import DEBUG, INFO, CRITICAL, EXCEPTION, \
+    emergency_exit, open_file, json_load, encode, FolderEntry
+from guid_replacer import GUIDReplacer
+
+
+# Files with replaced GUIDs bigger than this are spooled to disk
+SPOOL_SIZE = 16 << 20
+
+
+class OverlayTree(object):
+    """Read-only view of application folder which make.py would
+        create, with the same interface as file system source
+        in build.py. Copied files are read from their sources,
+        generated ones are kept in memory and GUIDs are replaced
+        while files are read, so nothing is copied
+    """
+
+    def __init__(self, files, contents, guids):
+        # paths made from loaded config are unicode, build.py expects str
+        self.contents = dict(
+            (self.normalize(encode(path)), encode(data)) for path, data in contents.iteritems()
+        )
+        # generated content replaces copied file, e.g. page info
+        self.files = dict(
+            (path, encode(source)) for path, source in
+            ((self.normalize(encode(path)), source) for path, source in files.iteritems())
+            if path not in self.contents
+        )
+        self.replacer = GUIDReplacer(guids)
+        # files which contain GUIDs to replace: {path: bool}
+        self.remapped = {}
+
+        self.guids_digest = hashlib.sha1(
+            "".join("{} {}\n".format(*item) for item in sorted(guids.iteritems()))
+        ).hexdigest()
+
+        self.folders = {"": set()}
+        for folder in constants.BASE_FOLDERS:
+            self.add(folder, True)
+
+        for path in self.files.keys() + self.contents.keys():
+            self.add(path, False)
+
+        INFO("Overlay: %s files, %s generated, %s GUIDs to replace",
+             len(self.files), len(self.contents), len(guids))
+
+    def add(self, path, is_folder):
+        parent, _, name = path.rpartition("/")
+        if parent not in self.folders:
+            self.add(parent, True)
+
+        self.folders[parent].add(name)
+        if is_folder:
+            self.folders.setdefault(path, set())
+
+    @staticmethod
+    def normalize(path):
+        return "/".join(
+            part for part in path.replace(os.sep, "/").split("/")
+            if part and part != "."
+        )
+
+    def has_guids(self, path):
+        """Check if copied file @path contains GUIDs to replace
+        """
+        if path not in self.remapped:
+            self.remapped[path] = self.replacer.search_file(self.files[path])
+
+        return self.remapped[path]
+
+    def location(self, path):
+        path = self.normalize(path)
+        return "overlay:{}".format(self.files.get(path, path))
+
+    def signature(self, path):
+        """Source file size and mtime (or generated content)
+            and GUIDs mapping, which changes content
+        """
+        path = self.normalize(path)
+        if path in self.contents:
+            version = hashlib.sha1(self.contents[path]).hexdigest()
+
+        else:
+            stat = os.stat(self.files[path])
+            version = "{}:{!r}".format(stat.st_size, stat.st_mtime)
+
+        return "{}:{}".format(version, self.guids_digest)
+
+    def digest(self, path):
+        """SHA1 of file content with replaced GUIDs
+        """
+        sha = hashlib.sha1()
+        with self.open(path) as hdlr:
+            for block in iter(lambda: hdlr.read(1 << 20), ""):
+                sha.update(block)
+
+        return sha.hexdigest()
+
+    def exists(self, path):
+        path = self.normalize(path)
+        return path in self.files or path in self.contents or path in self.folders
+
+    def isdir(self, path):
+        return self.normalize(path) in self.folders
+
+    def isfile(self, path):
+        path = self.normalize(path)
+        return path in self.files or path in self.contents
+
+    def listdir(self, path):
+        path = self.normalize(path)
+        if path not in self.folders:
+            raise OSError(2, "No such directory", path)
+
+        return sorted(self.folders[path])
+
+    def scan(self, path):
+        """Return {name: entry} for folder @path
+        """
+        path = self.normalize(path)
+        if path not in self.folders:
+            raise OSError(2, "No such directory", path)
+
+        prefix = path + "/" if path else ""
+        return {
+            name: FolderEntry(path, name, prefix + name in self.folders)
+            for name in self.folders[path]
+        }
+
+    def open(self, path, mode="rb"):
+        """Open file @path. Source file is opened as is
+            if there are no GUIDs to replace in it
+        """
+        path = self.normalize(path)
+
+        if path in self.contents:
+            return io.BytesIO(self.replacer.replace(self.contents[path]))
+
+        if path not in self.files:
+            CRITICAL("Can't open file '%s' in overlay", path)
+            emergency_exit()
+
+        if not self.has_guids(path):
+            return open_file(self.files[path])
+
+        DEBUG("Replace GUIDs in '%s'", self.files[path])
+
+        try:
+            spool = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+            with open(self.files[path], "rb") as src:
+                self.replacer.replace_stream(src, spool)
+
+        except Exception:
+            CRITICAL("Can't open file '%s'", self.files[path])
+            EXCEPTION("")
+            emergency_exit()
+
+        spool.seek(0)
+        return spool
+
+    def reopen(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def load_overlay(path):
+    """Resolve make.py config file @path to OverlayTree
+    """
+    INFO("Resolving %s", path)
+
+    with open_file(path) as hdlr:
+        config = json_load(hdlr, critical=True)
+
+    target, guids = make.plan(config)
+    return OverlayTree(target["files"], target["contents"], guids)
@@ -5,6 +5,8 @@
 import argparse
 import base64
 import cStringIO
+import hashlib
+import imp
 import json
 import logging
 import os
@@ -18,9 +20,11 @@ import constants
 from helpers import setup_logging, DEBUG, INFO, ERROR, \
     EXCEPTION, check_python_version, script_exit, \
     create_folder, open_file, json_dump, \
-    build_path, clean_data, encode, BLOCK_END, \
+    build_path, clean_data, encode, normalize_text, BLOCK_END, \
     print_block_end, emergency_exit, check_by_regexps, \
     convert_to_regexp, json_load
+from manifest import write_manifest
+from git_helpers import FastImportStream
 
 
 # UUID regexp pattern
@@ -55,7 +59,7 @@ def detect_guids(data):
         PARSER.pages[page_id]["guids"].extend(RE_RES_UUID.findall(data))
 
 
-def detect_libraries(script_path):
+def detect_libraries(script_path, data):
     """Find all libs used by script
     """
     if ACTION_EXT != ".py":
@@ -69,7 +73,8 @@ def detect_libraries(script_path):
     finder = ModuleFinder()
     try:
         DEBUG("Parsing: %s", script_path)
-        finder.run_script(script_path)
+        finder.load_module("__main__", cStringIO.StringIO(data),
+                           script_path, ("", "r", imp.PY_SOURCE))
         DEBUG("Done: %s", script_path)
 
     except Exception:
@@ -215,7 +220,7 @@ class InformationTagHandler(TagHandler):
 
         # remove unnecessary symbols from data and encode it
         for key, value in self.data.items():
-            self.data[key] = encode(clean_data("".join(value)))
+            self.data[key] = normalize_text("".join(value))
 
         # detect application programming language
         ACTION_EXT = {
@@ -632,7 +637,7 @@ class ActionsTagHandler(TagHandler):
         action_path = os.path.join(PARSER.current_path(),
                                    self.current_action["name"])
 
-        detect_libraries(action_path)
+        detect_libraries(action_path, data)
 
     def save_actions_map(self):
         PARSER.write_json_file(
@@ -701,7 +706,7 @@ class ObjectTagHandler(TagHandler):
                 del self.attributes["source"]
 
         self.attributes = {
-            key: encode(clean_data("".join(val))).split('\n')
+            key: normalize_text("".join(val)).split('\n')
             for (key, val) in self.attributes.items()
         }
 
@@ -1042,10 +1047,16 @@ class Parser(object):
         self._handlers_stack = []
         self._current_path = []
         self.pages = {}
+        self.output = None
+        # {path relative to target: SHA1} of written files
+        self.hashes = {}
 
     def create_folder_from_current_path(self):
         """Create folder using current path
         """
+        if self.output:
+            return
+
         os.makedirs(self.current_path())
 
     def current_path(self):
@@ -1067,22 +1078,27 @@ class Parser(object):
         """Write data to file
         """
         path = build_path(self.current_path(), name)
+        data = data.encode('utf-8') if type(data) == unicode else data
+        rel_path = encode("/".join(self._current_path[1:] + [name]))
+
+        if self.output:
+            DEBUG("Streaming data of %s", rel_path)
+            self.output.write_file(rel_path, data)
+            return
 
         DEBUG("Writing data to %s", path)
 
         with open_file(path, "wb") as hdlr:
-            hdlr.write(data.encode('utf-8') if type(data) == unicode else data)
+            hdlr.write(data)
+
+        # manifest doesn't read written files again
+        self.hashes[rel_path] = hashlib.sha1(data).hexdigest()
 
     def write_json_file(self, name, data):
         """Convert data to JSON and
             write it to file
         """
-        path = build_path(self.current_path(), name)
-
-        DEBUG("Writing JSON data to %s", path)
-
-        with open_file(path, "wb") as hdlr:
-            json_dump(data, hdlr, critical=True)
+        self.write_file(name, json_dump(data, critical=True))
 
     @property
     def current_handler(self):
@@ -1138,6 +1154,9 @@ class Parser(object):
         self.target_folder = target
         self.append_to_current_path(self.target_folder)
 
+        if config["git"]["repo"]:
+            self.output = FastImportStream(**config["git"])
+
         RootHandler().register()
 
         expat = xml.parsers.expat.ParserCreate()
@@ -1149,6 +1168,9 @@ class Parser(object):
 
         expat.ParseFile(source)
 
+        if self.output:
+            self.output.commit()
+
 
 @print_block_end
 def create_basic_structure(config):
@@ -1228,8 +1250,14 @@ def parse(config):
     """Call copy functions in cycle
     """
     parse_ignore_file(config)
+
+    if config["git"]["repo"]:
+        parse_app(config)
+        return
+
     create_basic_structure(config)
     parse_app(config)
+    write_manifest(config["target"]["path"], PARSER.hashes)
 
 
 def main():
@@ -1293,6 +1321,16 @@ def main():
                              action="store_true",
                              help="parse application actions")
 
+    args_parser.add_argument("--git-fast-import", type=str, metavar="REPO",
+                             help="commit application to git repository "
+                                  "instead of writing files")
+
+    args_parser.add_argument("--git-branch", type=str, default="master",
+                             help="branch for --git-fast-import")
+
+    args_parser.add_argument("--git-message", type=str, default="",
+                             help="commit message for --git-fast-import")
+
     args_parser.add_argument("-ds", "--delete-source",
                              action="store_true",
                              help="delete source .xml file")
@@ -1327,6 +1365,11 @@ def main():
         "source": args.source,
         "ignore": ignore,
         "delete_source": args.delete_source,
+        "git": {
+            "repo": args.git_fast_import,
+            "branch": args.git_branch,
+            "message": args.git_message,
+        },
         "parse": {
             "app_actions": args.app_actions,
             "e2vdom": args.e2vdom,
@@ -1353,7 +1396,12 @@ def main():
         args.source.close()
         os.remove(args.source.name)
 
-    INFO("\nPath to application:\n{}".format(config["target"]["path"]))
+    if config["git"]["repo"]:
+        INFO("\nApplication committed to:\n{} {}".format(
+            config["git"]["repo"], config["git"]["branch"]))
+
+    else:
+        INFO("\nPath to application:\n{}".format(config["target"]["path"]))
 
 
 if __name__ == "__main__":
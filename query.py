@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+
+import argparse
+import logging
+import os
+import re
+import sqlite3
+
+import constants
+from helpers import setup_logging, DEBUG, INFO, ERROR, \
+    check_python_version, script_exit, emergency_exit, \
+    json_load, open_file, tree_cache_path, USER_CACHE
+
+
+# UUID regexp pattern
+RE_RES_UUID = re.compile("[0-F]{8}-[0-F]{4}-[0-F]{4}-[0-F]{4}-[0-F]{12}", re.I)
+
+# Python import statements in actions and libraries
+RE_IMPORT = re.compile(r"^\s*(?:from\s+([\w.]+)\s+import|import\s+([\w., ]+))", re.M)
+
+
+# Kinds of index terms
+KINDS = ("guid", "ref", "type", "name", "action", "import")
+
+# Files with these extentions are scanned for GUID references
+TEXT_EXTS = (".json", ".py", ".vb", ".js")
+
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS terms_lookup ON terms (kind, key);
+CREATE INDEX IF NOT EXISTS terms_path ON terms (path);
+"""
+
+
+def iter_tree(root):
+    """Yield (relative path, stat) for every file in unpacked tree
+    """
+    skip = set(constants.DO_NOT_DELETE) | \
+        set([constants.MANIFEST_FILE, constants.MAKE_STATE_FILE])
+
+    for cwd, dirs, files in os.walk(root):
+        dirs[:] = [name for name in dirs if name not in skip]
+
+        for name in files:
+            if name in skip:
+                continue
+
+            path = os.path.join(cwd, name)
+            yield os.path.relpath(path, root), os.stat(path)
+
+
+def import_names(data):
+    """Return module names imported by script @data
+    """
+    names = set()
+    for from_name, import_list in RE_IMPORT.findall(data):
+        if from_name:
+            names.add(from_name)
+
+        else:
+            for name in import_list.split(","):
+                name = name.strip().split(" ", 1)[0]
+                if name:
+                    names.add(name)
+
+    return names
+
+
+def extract_terms(root, rel_path):
+    """Return set of (kind, key) pairs describing file @rel_path
+    """
+    terms = set()
+    parts = rel_path.split(os.sep)
+    name = parts[-1]
+    ext = os.path.splitext(name)[1].lower()
+
+    if parts[0] in (constants.RESOURCES_FOLDER, constants.DATABASES_FOLDER):
+        guid = RE_RES_UUID.match(name)
+        if guid:
+            terms.add(("guid", guid.group(0)))
+            name = name[len(guid.group(0)) + 1:]
+
+            # resources are named {ID}_{Type}_{Name}, databases {ID}_{Name}.{Type}
+            if parts[0] == constants.RESOURCES_FOLDER:
+                name = name.split("_", 1)[-1]
+
+            else:
+                name = os.path.splitext(name)[0]
+
+        terms.add(("name", name))
+        return set((kind, key) for kind, key in terms if key)
+
+    if parts[0] == constants.LIBRARIES_FOLDER:
+        terms.add(("name", name.split(".", 1)[0]))
+
+    if ext not in TEXT_EXTS:
+        return terms
+
+    with open_file(os.path.join(root, rel_path)) as hdlr:
+        data = hdlr.read()
+
+    terms.update(("ref", guid) for guid in RE_RES_UUID.findall(data))
+
+    if ext in (".py", ".vb") or parts[0] == constants.LIBRARIES_FOLDER:
+        terms.update(("import", lib) for lib in import_names(data))
+
+        if parts[0] != constants.LIBRARIES_FOLDER:
+            terms.add(("action", name.rsplit(".", 1)[0]))
+
+        return set((kind, key) for kind, key in terms if key)
+
+    if ext != ".json":
+        return terms
+
+    content = json_load(data)
+    if content is None:
+        ERROR("Can't index file: %s", rel_path)
+        return terms
+
+    if name == constants.MAP_FILE:
+        for attrs in content.values():
+            terms.add(("action", attrs.get("Name", "")))
+            terms.add(("guid", attrs.get("ID", "")))
+
+    elif name == constants.LIBRARIES_FILE:
+        terms.update(("import", lib) for lib in content)
+
+    elif isinstance(content, dict) and isinstance(content.get("attrs"), dict):
+        attrs = content["attrs"]
+        terms.add(("guid", attrs.get("ID", "")))
+        terms.add(("type", attrs.get("Type", "")))
+        terms.add(("name", attrs.get("Name", "")))
+
+    return set((kind, key) for kind, key in terms if key)
+
+
+class Index(object):
+    """Persistent index of unpacked application tree
+    """
+
+    def __init__(self, root, path=None):
+        self.root = root
+        # indexes are kept in user cache folder, not in application tree
+        self.path = path or tree_cache_path("index", root, ".sqlite")
+
+        folder = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        self.db = sqlite3.connect(self.path)
+        self.db.text_factory = str
+        self.db.executescript(INDEX_SCHEMA)
+
+    def update(self):
+        """Reindex files which were added, changed
+            or removed since last update
+        """
+        DEBUG("Updating index %s", self.path)
+
+        known = dict(
+            (path, (mtime, size)) for path, mtime, size in
+            self.db.execute("SELECT path, mtime, size FROM files")
+        )
+
+        changed = []
+        for rel_path, stat in iter_tree(self.root):
+            state = known.pop(rel_path, None)
+            if state != (stat.st_mtime, stat.st_size):
+                changed.append((rel_path, stat))
+
+        removed = known.keys()
+
+        with self.db:
+            for rel_path in removed:
+                DEBUG("Remove from index: %s", rel_path)
+                self.forget(rel_path)
+
+            for rel_path, stat in changed:
+                DEBUG("Index file: %s", rel_path)
+                self.forget(rel_path)
+                self.db.executemany(
+                    "INSERT INTO terms (kind, key, path) VALUES (?, ?, ?)",
+                    ((kind, key.lower(), rel_path) for kind, key in
+                     extract_terms(self.root, rel_path))
+                )
+                self.db.execute(
+                    "INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)",
+                    (rel_path, stat.st_mtime, stat.st_size)
+                )
+
+        INFO("Index updated: %s changed, %s removed", len(changed), len(removed))
+
+    def empty(self):
+        """Check if nothing is indexed yet
+        """
+        return self.db.execute("SELECT path FROM files LIMIT 1").fetchone() is None
+
+    def forget(self, rel_path):
+        """Remove file from index
+        """
+        self.db.execute("DELETE FROM terms WHERE path = ?", (rel_path,))
+        self.db.execute("DELETE FROM files WHERE path = ?", (rel_path,))
+
+    def lookup(self, kind, key):
+        """Return sorted list of files matching term
+        """
+        return [row[0] for row in self.db.execute(
+            "SELECT DISTINCT path FROM terms WHERE kind = ? AND key = ? "
+            "ORDER BY path", (kind, key.lower())
+        )]
+
+    def close(self):
+        self.db.close()
+
+
+def page_of(rel_path):
+    """Return page name for file inside Pages folder
+    """
+    parts = rel_path.split(os.sep)
+    if len(parts) > 2 and parts[0] == constants.PAGES_FOLDER:
+        return parts[1]
+
+    return None
+
+
+def query(config):
+    """Print files matching query. Index is refreshed
+        only on request or when it's empty, as refresh
+        stats every file of tree
+    """
+    if not os.path.isdir(config["source"]):
+        ERROR("Can't find %s", config["source"])
+        emergency_exit()
+
+    index = Index(config["source"], config["index"])
+
+    try:
+        if config["rebuild"]:
+            with index.db:
+                index.db.execute("DELETE FROM terms")
+                index.db.execute("DELETE FROM files")
+
+        if config["update"] or config["rebuild"] or index.empty():
+            index.update()
+
+        result = index.lookup(config["kind"], config["key"])
+
+    finally:
+        index.close()
+
+    if config["pages"]:
+        result = sorted(set(filter(None, map(page_of, result))))
+
+    for line in result:
+        print line
+
+    return result
+
+
+def main():
+    """Main function
+    """
+    args_parser = argparse.ArgumentParser()
+
+    args_parser.add_argument("source", type=str,
+                             help="application source folder")
+
+    args_parser.add_argument("kind", type=str, choices=KINDS,
+                             help="what to look for")
+
+    args_parser.add_argument("key", type=str,
+                             help="GUID, type, name, action or module")
+
+    args_parser.add_argument("-i", "--index", type=str,
+                             help="index file (default: in {})".format(
+                                 os.path.join(USER_CACHE, "index")))
+
+    args_parser.add_argument("-p", "--pages", action="store_true",
+                             help="print page names instead of files")
+
+    args_parser.add_argument("-r", "--rebuild", action="store_true",
+                             help="rebuild index from scratch")
+
+    args_parser.add_argument("-u", "--update", action="store_true",
+                             help="refresh index of changed files before lookup")
+
+    args_parser.add_argument("-v", "--verbosity", action="count",
+                             help="be more verbose",
+                             default=0)
+
+    args = args_parser.parse_args()
+
+    # Setup logging system and show necessary messages
+    setup_logging(logging.WARNING if args.verbosity == 0 else logging.DEBUG,
+                  module_name=True if args.verbosity > 1 else False)
+
+    config = {
+        "source": args.source,
+        "index": args.index,
+        "kind": args.kind,
+        "key": args.key,
+        "pages": args.pages,
+        "rebuild": args.rebuild,
+        "update": args.update,
+    }
+
+    query(config)
+
+
+if __name__ == "__main__":
+    check_python_version()
+    main()
+    script_exit()
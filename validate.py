@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import json
+import os
+from multiprocessing.pool import ThreadPool
+
+import constants
+from helpers import encode, decode
+
+
+# Keys required in object files and __info__.json of object folders
+OBJECT_KEYS = ("attrs", "attributes")
+# Keys required in __e2vdom__.json
+E2VDOM_KEYS = ("events", "actions")
+
+
+class Report(object):
+    """Problems, warnings and GUIDs found in checked files.
+        Warnings are about things build handles itself
+    """
+
+    def __init__(self):
+        self.problems = []
+        self.warnings = []
+        self.objects = []
+        self.actions = []
+
+    @staticmethod
+    def format(path, message, args):
+        """Format message as unicode: values from
+            JSON are unicode, paths are UTF-8 str
+        """
+        args = [decode(arg) if isinstance(arg, str) else arg for arg in args]
+        return u"{}: {}".format(decode(path), decode(message).format(*args))
+
+    def problem(self, path, message, *args):
+        self.problems.append(self.format(path, message, args))
+
+    def warning(self, path, message, *args):
+        self.warnings.append(self.format(path, message, args))
+
+    def update(self, other):
+        self.problems.extend(other.problems)
+        self.warnings.extend(other.warnings)
+        self.objects.extend(other.objects)
+        self.actions.extend(other.actions)
+
+
+def load_json(source, path, report):
+    """Return parsed JSON file @path or None if it's broken
+    """
+    try:
+        with source.open(path) as hdlr:
+            return json.load(hdlr)
+
+    except ValueError as error:
+        report.problem(path, "broken JSON: {}", error)
+        return None
+
+
+def check_json(source, path, names):
+    report = Report()
+    load_json(source, path, report)
+    return report
+
+
+def check_object(source, path, names, order=None):
+    """Check object file or __info__.json of object folder.
+        @names are names of files next to @path, @order
+        is position of folder object in build traversal
+    """
+    report = Report()
+    data = load_json(source, path, report)
+    if data is None:
+        return report
+
+    if not isinstance(data, dict):
+        report.problem(path, "object must be JSON object")
+        return report
+
+    for key in OBJECT_KEYS:
+        if key not in data:
+            report.problem(path, "missing key '{}'", key)
+
+    is_folder = os.path.basename(path) == constants.INFO_FILE
+
+    attrs = data.get("attrs")
+    if attrs is None and is_folder:
+        return report
+
+    if not isinstance(attrs, dict):
+        report.problem(path, "'attrs' must be JSON object")
+        return report
+
+    # build skips folder objects with duplicate GUIDs only
+    if is_folder and "ID" in attrs:
+        report.objects.append((order, attrs["ID"], path))
+
+    # @names are str as listed by source
+    source_name = attrs.get("source_file_name")
+    if isinstance(source_name, unicode):
+        source_name = encode(source_name)
+
+    if attrs.get("Type") in constants.EXTERNAL_SOURCE_TYPES and \
+            source_name is not None and source_name not in names:
+
+        report.problem(path, "source file '{}' not found", source_name)
+
+    return report
+
+
+def check_map(source, path, names):
+    """Check __map__.json of actions folder
+    """
+    report = Report()
+    data = load_json(source, path, report)
+    if data is None:
+        return report
+
+    if not isinstance(data, dict):
+        report.problem(path, "actions map must be JSON object")
+        return report
+
+    for name, attrs in data.iteritems():
+        if not isinstance(attrs, dict) or "ID" not in attrs:
+            report.problem(path, "missing ID of action '{}'", name)
+            continue
+
+        action_path = os.path.join(os.path.dirname(path), name)
+        report.actions.append((action_path, attrs["ID"], action_path))
+
+    return report
+
+
+def check_e2vdom(source, path, names):
+    report = Report()
+    data = load_json(source, path, report)
+    if data is None:
+        return report
+
+    for key in E2VDOM_KEYS:
+        if not isinstance(data, dict) or not isinstance(data.get(key), list):
+            report.problem(path, "missing list '{}'", key)
+
+    return report
+
+
+def run_task(task):
+    return task[0](*task[1:])
+
+
+def actions_tasks(source, path, report):
+    """Return tasks for actions folder @path
+    """
+    try:
+        entries = source.scan(path)
+
+    except OSError:
+        return []
+
+    names = set(entries)
+    files = [
+        name for name, entry in entries.iteritems()
+        if name not in constants.RESERVED_NAMES and not entry.is_dir()
+    ]
+
+    if constants.MAP_FILE not in names:
+        if files:
+            report.problem(path, "no {}, {} actions will be lost",
+                           constants.MAP_FILE, len(files))
+        return []
+
+    return [(check_map, source, os.path.join(path, constants.MAP_FILE), names)]
+
+
+def load_childs_order(source, path, report):
+    """Return {lower case name: position} of children of folder
+        @path as build does. Broken file is ignored by build
+    """
+    order_path = os.path.join(path, constants.CHILDS_ORDER)
+    try:
+        with source.open(order_path) as hdlr:
+            names = json.load(hdlr)
+
+    except ValueError as error:
+        report.warning(order_path, "broken JSON, children are written by names: {}", error)
+        return {}
+
+    if not isinstance(names, (list, dict)) or \
+            not all(isinstance(name, basestring) for name in names):
+
+        report.problem(order_path, "must be list of names")
+        return {}
+
+    return dict((name.lower(), index) for index, name in enumerate(names))
+
+
+def child_key(childs_order, name):
+    """Position of child @name among children of its folder,
+        see key_func of build.write_folder
+    """
+    key = name.lower()
+    if key.endswith(".json"):
+        key = key[:-5]
+
+    return (childs_order.get(key, len(childs_order) + 1), name)
+
+
+def collect_tasks(source, root, report):
+    """Walk application tree in the same way as build does
+        and return list of file checks
+    """
+    tasks = []
+
+    info_path = os.path.join(root, constants.INFO_FILE)
+    if source.exists(info_path):
+        tasks.append((check_json, source, info_path, ()))
+
+    else:
+        report.problem(info_path, "not found")
+
+    tasks.extend(actions_tasks(
+        source, os.path.join(root, constants.APP_ACTIONS_FOLDER), report))
+
+    users_path = os.path.join(root, constants.SECURITY_FOLDER, constants.USERS_GROUPS_FILE)
+    if source.exists(users_path):
+        tasks.append((check_json, source, users_path, ()))
+
+    pages_path = os.path.join(root, constants.PAGES_FOLDER)
+    try:
+        pages = source.scan(pages_path)
+
+    except OSError:
+        report.problem(pages_path, "not found")
+        return tasks
+
+    # order of pages and children is kept to know
+    # which of objects with the same GUID build writes
+    stack = [(pages_path, name, True, (name,)) for name in pages]
+
+    while stack:
+        parent, name, is_page, order = stack.pop()
+        path = os.path.join(parent, name)
+        actions_folder = "Actions-{}".format(name)
+
+        try:
+            entries = source.scan(path)
+
+        except OSError:
+            report.problem(path, "not a folder")
+            continue
+
+        names = set(entries)
+
+        if constants.INFO_FILE in names:
+            tasks.append((check_object, source, os.path.join(path, constants.INFO_FILE),
+                          names, order))
+
+        else:
+            report.problem(path, "no {}", constants.INFO_FILE)
+
+        childs_order = {}
+        if constants.CHILDS_ORDER in names:
+            childs_order = load_childs_order(source, path, report)
+
+        if is_page and constants.E2VDOM_FILE in names:
+            tasks.append((check_e2vdom, source, os.path.join(path, constants.E2VDOM_FILE), names))
+
+        if actions_folder in names and entries[actions_folder].is_dir():
+            tasks.extend(actions_tasks(source, os.path.join(path, actions_folder), report))
+
+        for child, entry in entries.iteritems():
+            if child in constants.RESERVED_NAMES or child == actions_folder or \
+                    constants.RESERVED_NAMES_REGEXP.match(child):
+
+                continue
+
+            if entry.is_dir():
+                stack.append((path, child, False, order + (child_key(childs_order, child),)))
+
+            else:
+                tasks.append((check_object, source, os.path.join(path, child), names))
+
+    return tasks
+
+
+def find_duplicates(kind, guids, report):
+    """Warn about GUIDs used by several objects or actions.
+        @guids are (order, GUID, path), build keeps the first
+        object in order and skips others with their subtrees
+    """
+    paths = {}
+    skipped = []
+    for order, guid, path in sorted(guids):
+        folder = os.path.dirname(path) + os.sep
+        if any(folder.startswith(prefix) for prefix in skipped):
+            continue
+
+        paths.setdefault(guid, []).append(path)
+        if kind == "object" and len(paths[guid]) > 1:
+            skipped.append(folder)
+
+    for guid, guid_paths in sorted(paths.iteritems()):
+        if len(guid_paths) > 1:
+            report.warning(
+                guid_paths[0], "{} GUID {} is also used by {}, build skips them",
+                kind, guid, ", ".join(guid_paths[1:])
+            )
+
+
+def validate(source, root, jobs=1):
+    """Check application tree @root of @source (see build.py).
+        Return sorted lists of all found problems and warnings
+        and number of checked files
+    """
+    report = Report()
+    tasks = collect_tasks(source, root, report)
+
+    pool = ThreadPool(jobs) if jobs > 1 else None
+    try:
+        for result in (pool.imap_unordered if pool else map)(run_task, tasks):
+            report.update(result)
+
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+    find_duplicates("object", report.objects, report)
+    find_duplicates("action", report.actions, report)
+
+    return sorted(report.problems), sorted(report.warnings), len(tasks)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+
+import constants
+from helpers import DEBUG, INFO, ERROR, scan_folder
+
+
+# inotify events which mean change of source tree
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+    IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+IN_CLOEXEC = 0o2000000
+
+# struct inotify_event header: wd, mask, cookie, len
+EVENT_HEADER = struct.Struct("iIII")
+
+# Names which never trigger rebuild
+SKIP_NAMES = set(constants.DO_NOT_DELETE) | set([
+    constants.MANIFEST_FILE,
+    constants.MAKE_STATE_FILE,
+])
+
+
+def skipped(path, ignore):
+    """Check if changes of @path must be ignored
+    """
+    if os.path.basename(path) in SKIP_NAMES:
+        return True
+
+    path = os.path.abspath(path)
+    return any(path == item or path.startswith(item + os.sep) for item in ignore)
+
+
+def iter_folders(root, ignore):
+    """Yield @root and all its subfolders except ignored ones
+    """
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        yield path
+
+        try:
+            entries = scan_folder(path)
+
+        except OSError:
+            continue
+
+        for name, entry in entries.iteritems():
+            child = os.path.join(path, name)
+            if entry.is_dir() and not skipped(child, ignore):
+                stack.append(child)
+
+
+class PollingWatcher(object):
+    """Detect changes by comparing size and mtime
+        of every file each @interval seconds
+    """
+
+    def __init__(self, root, ignore=(), interval=1.0):
+        self.root = root
+        self.ignore = [os.path.abspath(path) for path in ignore]
+        self.interval = interval
+        self.snapshot = self.take_snapshot()
+
+        INFO("Watching %s by polling every %s seconds", root, interval)
+
+    def take_snapshot(self):
+        snapshot = {}
+        for folder in iter_folders(self.root, self.ignore):
+            try:
+                entries = scan_folder(folder)
+
+            except OSError:
+                continue
+
+            for name in entries:
+                path = os.path.join(folder, name)
+                if skipped(path, self.ignore):
+                    continue
+
+                try:
+                    stat = os.stat(path)
+
+                except OSError:
+                    continue
+
+                snapshot[path] = (stat.st_size, stat.st_mtime)
+
+        return snapshot
+
+    def wait(self, timeout=None):
+        """Return set of changed paths, empty set
+            if nothing has changed in @timeout seconds
+        """
+        deadline = None if timeout is None else time.time() + timeout
+
+        while True:
+            delay = self.interval if deadline is None \
+                else min(self.interval, max(deadline - time.time(), 0))
+            time.sleep(delay)
+
+            snapshot = self.take_snapshot()
+            changed = set(
+                path for path in set(snapshot) | set(self.snapshot)
+                if snapshot.get(path) != self.snapshot.get(path)
+            )
+            self.snapshot = snapshot
+
+            if changed or (deadline is not None and time.time() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """Detect changes with Linux inotify through libc,
+        every folder of tree is watched
+    """
+
+    def __init__(self, root, ignore=()):
+        self.root = root
+        self.ignore = [os.path.abspath(path) for path in ignore]
+        self.folders = {}
+
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        try:
+            self.watch_tree(root)
+
+        except OSError:
+            self.close()
+            raise
+
+        INFO("Watching %s with inotify: %s folders", root, len(self.folders))
+
+    def watch_tree(self, root):
+        for path in iter_folders(root, self.ignore):
+            wd = self.libc.inotify_add_watch(self.fd, path, WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOENT:
+                    continue
+
+                raise OSError(error, "inotify_add_watch failed", path)
+
+            self.folders[wd] = path
+
+    def wait(self, timeout=None):
+        """Return set of changed paths, empty set
+            if nothing has changed in @timeout seconds
+        """
+        changed = set()
+
+        while not changed:
+            ready = select.select([self.fd], [], [], timeout)[0]
+            if not ready:
+                return changed
+
+            data = os.read(self.fd, 1 << 16)
+            offset = 0
+
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip("\0")
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    ERROR("Too many changes, events are lost")
+                    changed.add(self.root)
+                    continue
+
+                folder = self.folders.get(wd)
+                if folder is None:
+                    continue
+
+                path = os.path.join(folder, name) if name else folder
+                if skipped(path, self.ignore):
+                    continue
+
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    DEBUG("Watching new folder: %s", path)
+                    self.watch_tree(path)
+
+                changed.add(path)
+
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_watcher(root, ignore=(), interval=1.0):
+    """Return inotify watcher if it's available
+        or polling one otherwise
+    """
+    try:
+        return InotifyWatcher(root, ignore)
+
+    except (OSError, AttributeError) as error:
+        DEBUG("Can't use inotify: %s", error)
+
+    return PollingWatcher(root, ignore, interval)
+
+
+def wait_changes(watcher, debounce=0.5):
+    """Wait for changes and return all paths changed until
+        there were no changes during @debounce seconds
+    """
+    changed = watcher.wait()
+
+    while True:
+        more = watcher.wait(debounce)
+        if not more:
+            return changed
+
+        changed |= more
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import shutil
+
+from helpers import needs_cdata, CDATA_START, CDATA_END, CDATA_END_ESCAPED
+
+
+# Precomputed indent strings
+INDENTS = [" " * i for i in xrange(256)]
+
+
+def to_str(value):
+    """Convert value to UTF-8 encoded str
+    """
+    if isinstance(value, str):
+        return value
+
+    if isinstance(value, unicode):
+        return value.encode("utf8")
+
+    return str(value)
+
+
+def format_attrs(attrs, sort=False):
+    """Return attributes string with leading space.
+        @attrs is dict or list of (name, value) pairs
+    """
+    if not attrs:
+        return ""
+
+    if isinstance(attrs, dict):
+        attrs = attrs.iteritems()
+
+    if sort:
+        attrs = sorted(attrs)
+
+    return " " + " ".join([
+        to_str(key) + '="' + to_str(value) + '"'
+        for key, value in attrs
+    ])
+
+
+def indent_str(indent):
+    return INDENTS[indent] if indent < 256 else " " * indent
+
+
+def open_tag(tagname, attrs=None, indent=0, sort=False):
+    """Return opening tag of element with data: <tag attrs>
+    """
+    return "%s<%s%s>" % (indent_str(indent), to_str(tagname), format_attrs(attrs, sort))
+
+
+def close_tag(tagname):
+    """Return closing tag of element with data: </tag>
+    """
+    return "</%s>\n" % to_str(tagname)
+
+
+class XMLEmitter(object):
+    """Buffered writer of application XML.
+        Parts are collected in list and written
+        to @stream by blocks of @block_size bytes.
+        Optional @rewrite function is applied to every
+        written part except copied files. Attributes
+        are written sorted by name if @sort_attrs
+    """
+
+    def __init__(self, stream, block_size=1 << 20, rewrite=None, sort_attrs=False):
+        self.stream = stream
+        self.block_size = block_size
+        self.rewrite = rewrite
+        self.sort_attrs = sort_attrs
+        self.parts = []
+        self.size = 0
+
+    indent = staticmethod(indent_str)
+
+    def write(self, data):
+        """Write raw string
+        """
+        if self.rewrite:
+            data = self.rewrite(data)
+
+        self.parts.append(data)
+        self.size += len(data)
+
+        if self.size >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        """Write collected parts to stream
+        """
+        if self.parts:
+            self.stream.writelines(self.parts)
+            self.parts = []
+            self.size = 0
+
+    def start(self, tagname, attrs=None, indent=0):
+        """Write opening tag: <tag attrs>
+        """
+        self.write("%s<%s%s>\n" % (
+            self.indent(indent), to_str(tagname), format_attrs(attrs, self.sort_attrs)))
+
+    def end(self, tagname, indent=0):
+        """Write closing tag: </tag>
+        """
+        self.write("%s</%s>\n" % (self.indent(indent), to_str(tagname)))
+
+    def empty(self, tagname, attrs=None, indent=0):
+        """Write empty element: <tag attrs/>
+        """
+        self.write("%s<%s%s/>\n" % (
+            self.indent(indent), to_str(tagname), format_attrs(attrs, self.sort_attrs)))
+
+    def element(self, tagname, attrs=None, data="", indent=0, force_cdata=False):
+        """Write element with data: <tag attrs>data</tag>.
+            Element without data (None) is written as empty one
+        """
+        if data is None:
+            self.empty(tagname, attrs, indent)
+            return
+
+        tagname = to_str(tagname)
+        data = to_str(data)
+
+        self.write("%s<%s%s>" % (self.indent(indent), tagname, format_attrs(attrs, self.sort_attrs)))
+
+        if needs_cdata(data, force_cdata):
+            self.write(CDATA_START)
+            self.write(data.replace(CDATA_END, CDATA_END_ESCAPED))
+            self.write(CDATA_END)
+
+        else:
+            self.write(data)
+
+        self.write("</%s>\n" % tagname)
+
+    def splice(self, tagname, attrs, indent, src):
+        """Write element with content of file object @src as data.
+            Content must not need CDATA wrapping (e.g. base64 data)
+        """
+        self.write(open_tag(tagname, attrs, indent, self.sort_attrs))
+        self.copy_from(src)
+        self.write(close_tag(tagname))
+
+    def copy_from(self, src):
+        """Write content of file object @src as is
+        """
+        self.flush()
+        shutil.copyfileobj(src, self.stream, 1 << 20)